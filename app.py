@@ -1,28 +1,143 @@
-from flask import Flask, request, jsonify, render_template, redirect, url_for, send_from_directory, session
+from flask import Flask, request, jsonify, render_template, redirect, url_for, send_from_directory, session, stream_with_context, g, abort, has_request_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import generate_password_hash, check_password_hash, safe_join
+from werkzeug.wsgi import get_input_stream
+from markupsafe import Markup
+from sqlalchemy import text, table, column, literal_column, func, insert, update, inspect, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import selectinload, load_only
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, Future, TimeoutError as FutureTimeout
+from datetime import datetime
 import os
+import io
+import csv
+import zlib
+import click
+import atexit
+import hashlib
+import mimetypes
+import tempfile
+import queue
+import threading
+import re
+import time
+import base64
+import bisect
+import heapq
+import math
+import random
 import logging
 import json
 
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # renditions are skipped without Pillow
+    Image = None
+
+try:
+    import orjson
+except ImportError:  # falls back to the stdlib encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # responses and static files are only gzipped
+    brotli = None
+
 # Set up logging
-logging.basicConfig(level=logging.DEBUG)
+# LOG_LEVEL=DEBUG turns on the hot-path debug logs, of which only LOG_SAMPLE_RATE are written
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper())
 
-app = Flask(__name__)
+class CatalogFlask(Flask):
+    def send_static_file(self, filename):
+        # Flask's static route lands here; serve a precompressed variant when the client accepts one
+        return send_precompressed(self.static_folder, filename, max_age=self.get_send_file_max_age(filename))
+
+app = CatalogFlask(__name__)
 CORS(app)
 
 # Configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///products.db'
+# DATABASE_URL picks the database (any SQLAlchemy URL, e.g. postgresql://...);
+# STORAGE_MODE=production tunes SQLite for several gunicorn workers and batches API writes
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///products.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['STORAGE_MODE'] = os.environ.get('STORAGE_MODE', 'development')
+app.config['SQLITE_BUSY_TIMEOUT'] = 30  # seconds a connection waits for a lock before "database is locked"
+app.config['SQLITE_PRAGMAS'] = {
+    'journal_mode': 'WAL',  # readers no longer block behind the writer
+    'synchronous': 'NORMAL',  # safe with WAL, one fsync per checkpoint instead of per commit
+    'temp_store': 'MEMORY',
+    'cache_size': -64000,  # 64MB page cache per connection
+    'mmap_size': 256 * 1024 * 1024
+}
+app.config['WRITE_QUEUE_ENABLED'] = app.config['STORAGE_MODE'] == 'production'
+app.config['WRITE_BATCH_SIZE'] = 64  # API writes grouped into one commit
+app.config['WRITE_BATCH_WINDOW'] = 0.002  # seconds the writer waits for more writes to join a batch
+app.config['WRITE_TIMEOUT'] = 30  # seconds a request waits on the write queue before giving up with a 503
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 app.config['ALLOWED_EXTENSIONS'] = {'png', 'jpg', 'jpeg', 'pdf'}
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['UPLOAD_CHUNK_SIZE'] = 1024 * 1024  # bytes hashed and written per read while storing uploads
+app.config['UPLOAD_CACHE_MAX_AGE'] = 365 * 24 * 60 * 60  # content-addressed files never change
+app.config['RENDITIONS_FOLDER'] = 'static/uploads/renditions'
+app.config['RENDITION_SIZES'] = {'thumb': 320, 'medium': 800}  # name -> max width in px
+app.config['RENDITION_QUALITY'] = 80
+app.config['RENDITION_WORKERS'] = 2
 app.config['SECRET_KEY'] = 'your-secret-key-here'  # Change this in production
+app.config['MAX_PER_PAGE'] = 100  # upper bound for per_page / limit on the JSON API
+app.config['COUNT_CACHE_TTL'] = 30  # seconds a cursor-mode total count is reused
+app.config['BULK_CHUNK_SIZE'] = 500  # rows per transaction in /products/bulk
+app.config['BULK_MAX_CONTENT_LENGTH'] = 2 * 1024 * 1024 * 1024  # 2GB, bulk feeds are streamed
+app.config['BULK_MAX_ERRORS'] = 1000  # per-row errors reported back before truncating
+app.config['EXPORT_BATCH_SIZE'] = 1000  # rows fetched per round trip while exporting
+app.config['BATCH_MAX_IDS'] = 1000  # products per /products/batch* request
+app.config['RESPONSE_CACHE_SIZE'] = 2048  # serialized API responses kept per worker
+app.config['RESPONSE_CACHE_TTL'] = 30  # seconds, bounds staleness across gunicorn workers
+app.config['API_CACHE_CONTROL'] = 'public, no-cache'  # let CDNs store but always revalidate
+app.config['FACET_PRICE_BUCKET'] = 500  # width of the offer_price histogram buckets
+app.config['NEAREST_START_RADIUS'] = 0.05  # first search box for near_* queries, relative to the target
+app.config['NEAREST_MAX_RADIUS'] = 5.0  # beyond this the nearest query sorts every candidate
+NEAREST_BOX_SLACK = 1e-9  # relative widening of the final box, so rounding can't drop its own farthest product
+app.config['SUGGEST_LIMIT'] = 10  # default /suggest results; the limit argument is capped at SUGGEST_MAX_LIMIT
+app.config['SUGGEST_MAX_LIMIT'] = 20
+app.config['SUGGEST_MAX_PHRASES'] = 500000  # bounds the per-worker autocomplete index
+app.config['SUGGEST_MAX_PRODUCTS'] = 1000000  # products it tracks; later ones are left out until others go
+app.config['SUGGEST_MAX_LENGTH'] = 100  # characters kept per indexed phrase
+app.config['SUGGEST_SCAN_LIMIT'] = 200  # phrase-prefix matches ranked per query
+app.config['SUGGEST_WORD_LIMIT'] = 50  # words a query token may expand to
+app.config['SUGGEST_MIN_SIMILARITY'] = 0.3  # trigram similarity for typo matches
+app.config['SUGGEST_REFRESH_INTERVAL'] = 1.0  # seconds between change-feed polls
+app.config['SUGGEST_READY_TIMEOUT'] = 5.0  # seconds a request waits for the first build
+app.config['CARD_CACHE_SIZE'] = 5000  # rendered product cards kept per worker
+app.config['COMPRESS_MIMETYPES'] = {'text/html', 'application/json', 'text/plain', 'text/css', 'text/javascript',
+                                    'application/javascript', 'image/svg+xml'}
+app.config['COMPRESS_MIN_SIZE'] = 500  # bytes; smaller bodies aren't worth the CPU
+app.config['COMPRESS_LEVEL'] = 6  # gzip level for responses
+app.config['COMPRESS_BROTLI_QUALITY'] = 5  # brotli quality for responses; precompressed files use the maximum
+app.config['COMPRESSED_CACHE_SIZE'] = 512  # compressed bodies of ETagged responses kept per worker
+app.config['PRECOMPRESS_EXTENSIONS'] = {'.css', '.js', '.mjs', '.svg', '.json', '.txt', '.html', '.map', '.xml'}
+app.config['LOG_SAMPLE_RATE'] = float(os.environ.get('LOG_SAMPLE_RATE', '0.1'))  # share of debug_sampled() calls logged
+app.config['LATENCY_BUCKETS'] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # seconds
+app.config['QUERY_COUNT_BUCKETS'] = (1, 2, 5, 10, 20, 50, 100, 200)  # SQL statements per request
+
+def engine_options(uri, production):
+    if make_url(uri).get_backend_name() == 'sqlite':
+        return {"connect_args": {"timeout": app.config['SQLITE_BUSY_TIMEOUT'], "check_same_thread": False}}
+    options = {"pool_pre_ping": True, "pool_recycle": 1800}
+    if production:
+        options.update(pool_size=10, max_overflow=20)
+    return options
 
-# Ensure upload folder exists
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'],
+                                                         app.config['STORAGE_MODE'] == 'production')
+
+# Ensure upload folders exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+os.makedirs(app.config['RENDITIONS_FOLDER'], exist_ok=True)
 
 db = SQLAlchemy(app)
 
@@ -32,6 +147,37 @@ class User(db.Model):
     username = db.Column(db.String(80), unique=True, nullable=False)
     password_hash = db.Column(db.String(128), nullable=False)
 
+# Change feed: a single-row sequence every product write draws its change_version from.
+# The row stays locked until commit, so versions become visible in the order they were issued.
+class ChangeSequence(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+def reserve_versions(connection, count):
+    # Returns the first of count consecutive change versions
+    sequence = ChangeSequence.__table__
+    last = connection.execute(sequence.update().where(sequence.c.id == 1)
+                              .values(version=sequence.c.version + count)
+                              .returning(sequence.c.version)).scalar_one()
+    return last - count + 1
+
+def current_change_version():
+    # The latest version any worker's write has reserved; one primary-key read
+    return db.session.query(ChangeSequence.version).filter(ChangeSequence.id == 1).scalar() or 0
+
+def next_change_version(context):
+    # Column default/onupdate for ORM writes; bulk paths reserve a block and pass versions explicitly
+    return reserve_versions(context.connection, 1)
+
+# Fields of the JSON representation, in to_dict() order
+PRODUCT_FIELDS = [
+    'id', 'category', 'product_name', 'short_description', 'long_description', 'mrp', 'offer_price', 'sku',
+    'in_stock', 'stock_number', 'stock_reserved', 'download_pdfs', 'product_image_urls', 'product_image_renditions', 'youtube_links',
+    'technical_information', 'manufacturer', 'special_note', 'whatsapp_number', 'is_rubber', 'rubber_density',
+    'rubber_height', 'rubber_length', 'rubber_thickness', 'rubber_description', 'variants', 'updated_at',
+    'change_version'
+]
+
 # Product Model
 class Product(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -41,12 +187,10 @@ class Product(db.Model):
     long_description = db.Column(db.Text)
     mrp = db.Column(db.Float)
     offer_price = db.Column(db.Float)
-    sku = db.Column(db.String(50))
+    sku = db.Column(db.String(50), index=True)
     in_stock = db.Column(db.Boolean, default=True)
     stock_number = db.Column(db.Integer)
-    download_pdfs = db.Column(db.Text)
-    product_image_urls = db.Column(db.Text)
-    youtube_links = db.Column(db.Text)
+    stock_reserved = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # held by open checkouts
     technical_information = db.Column(db.Text)
     manufacturer = db.Column(db.String(200))
     special_note = db.Column(db.Text)
@@ -57,44 +201,1466 @@ class Product(db.Model):
     rubber_length = db.Column(db.Float, nullable=True)
     rubber_thickness = db.Column(db.Float, nullable=True)
     rubber_description = db.Column(db.Text, nullable=True)
-    variants = db.Column(db.Text)  # Store variants as JSON string
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    change_version = db.Column(db.BigInteger, index=True, default=next_change_version, onupdate=next_change_version)
+    variants = db.relationship('ProductVariant', order_by='ProductVariant.position', cascade='all, delete-orphan')
+    images = db.relationship('ProductImage', order_by='ProductImage.position', cascade='all, delete-orphan')
+    pdfs = db.relationship('ProductPdf', order_by='ProductPdf.position', cascade='all, delete-orphan')
+    videos = db.relationship('ProductVideo', order_by='ProductVideo.position', cascade='all, delete-orphan')
+
+    # List-valued fields are child rows; the setters replace them and bump updated_at
+    @property
+    def image_urls(self):
+        return [image.url for image in self.images]
+
+    @image_urls.setter
+    def image_urls(self, urls):
+        # Keep existing rows (and their renditions) for urls that are still present
+        existing = {image.url: image for image in self.images}
+        self.images = [existing.pop(url, None) or ProductImage(url=url) for url in urls]
+        for position, image in enumerate(self.images):
+            image.position = position
+        self.updated_at = datetime.utcnow()
+
+    @property
+    def pdf_urls(self):
+        return [pdf.url for pdf in self.pdfs]
+
+    @pdf_urls.setter
+    def pdf_urls(self, urls):
+        self.pdfs = [ProductPdf(position=i, url=url) for i, url in enumerate(urls)]
+        self.updated_at = datetime.utcnow()
+
+    @property
+    def video_links(self):
+        return [video.url for video in self.videos]
+
+    @video_links.setter
+    def video_links(self, urls):
+        self.videos = [ProductVideo(position=i, url=url) for i, url in enumerate(urls)]
+        self.updated_at = datetime.utcnow()
+
+    @property
+    def variant_data(self):
+        return [variant.to_dict() for variant in self.variants]
+
+    @variant_data.setter
+    def variant_data(self, variants):
+        self.variants = [ProductVariant(position=i, name=v.get('name'), price=v.get('price'), sku=v.get('sku'))
+                         for i, v in enumerate(variants)]
+        self.updated_at = datetime.utcnow()
+
+    def images_with_renditions(self):
+        return [(image.url, json.loads(image.renditions) if image.renditions else None) for image in self.images]
+
+    def field_value(self, field):
+        if field == 'download_pdfs':
+            return self.pdf_urls
+        if field == 'product_image_urls':
+            return self.image_urls
+        if field == 'product_image_renditions':
+            return [r for _, r in self.images_with_renditions()]
+        if field == 'youtube_links':
+            return self.video_links
+        if field == 'variants':
+            return self.variant_data
+        if field == 'updated_at':
+            return self.updated_at.isoformat() if self.updated_at else None
+        return getattr(self, field)
+
+    def to_dict(self, fields=None):
+        # Only touches the requested fields, so deferred columns and unloaded children stay unloaded
+        return {field: self.field_value(field) for field in fields or PRODUCT_FIELDS}
+
+class ProductVariant(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete='CASCADE'), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    name = db.Column(db.String(200))
+    price = db.Column(db.Float, index=True)
+    sku = db.Column(db.String(50), index=True)
 
     def to_dict(self):
-        return {
-            "id": self.id,
-            "category": self.category,
-            "product_name": self.product_name,
-            "short_description": self.short_description,
-            "long_description": self.long_description,
-            "mrp": self.mrp,
-            "offer_price": self.offer_price,
-            "sku": self.sku,
-            "in_stock": self.in_stock,
-            "stock_number": self.stock_number,
-            "download_pdfs": self.download_pdfs.split(",") if self.download_pdfs else [],
-            "product_image_urls": self.product_image_urls.split(",") if self.product_image_urls else [],
-            "youtube_links": self.youtube_links.split(",") if self.youtube_links else [],
-            "technical_information": self.technical_information,
-            "manufacturer": self.manufacturer,
-            "special_note": self.special_note,
-            "whatsapp_number": self.whatsapp_number,
-            "is_rubber": self.is_rubber,
-            "rubber_density": self.rubber_density,
-            "rubber_height": self.rubber_height,
-            "rubber_length": self.rubber_length,
-            "rubber_thickness": self.rubber_thickness,
-            "rubber_description": self.rubber_description,
-            "variants": json.loads(self.variants) if self.variants else []
-        }
+        return {"name": self.name, "price": self.price, "sku": self.sku}
+
+class ProductImage(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete='CASCADE'), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    url = db.Column(db.Text, nullable=False)
+    renditions = db.Column(db.Text)  # JSON: {size: {jpeg, webp, width}}
+
+class ProductPdf(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete='CASCADE'), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    url = db.Column(db.Text, nullable=False)
+
+class ProductVideo(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete='CASCADE'), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    url = db.Column(db.Text, nullable=False)
+
+# Facet summary, kept current by triggers on product (see init_facet_summary)
+class FacetCount(db.Model):
+    facet = db.Column(db.String(20), primary_key=True)
+    value = db.Column(db.String(100), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+# Deleted products, so /products/changes can tell mirrors what to remove
+class ProductTombstone(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, nullable=False, index=True)
+    sku = db.Column(db.String(50))
+    change_version = db.Column(db.BigInteger, nullable=False, index=True)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+PRODUCT_CHILDREN = [Product.variants, Product.images, Product.pdfs, Product.videos]
+
+FIELD_CHILDREN = {
+    'variants': Product.variants,
+    'product_image_urls': Product.images,
+    'product_image_renditions': Product.images,
+    'download_pdfs': Product.pdfs,
+    'youtube_links': Product.videos
+}
+
+def with_children(product_query):
+    # One extra SELECT per child table for the whole page instead of one per product
+    return product_query.options(*[selectinload(rel) for rel in PRODUCT_CHILDREN])
+
+def with_fields(product_query, fields):
+    # Push a fields= selection down to SQL: load_only for columns, selectinload only for requested children
+    if not fields:
+        return with_children(product_query)
+    columns = [getattr(Product, f) for f in fields if f in Product.__table__.columns] or [Product.id]
+    children = dict.fromkeys(FIELD_CHILDREN[f] for f in fields if f in FIELD_CHILDREN)
+    return product_query.options(load_only(*columns), *[selectinload(rel) for rel in children])
+
+def parse_fields(value):
+    if not value:
+        return None
+    fields = [f.strip() for f in value.split(",") if f.strip()]
+    unknown = [f for f in fields if f not in PRODUCT_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+def dumps_json(payload):
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":")).encode('utf-8')
+
+# List fields arrive as lists or comma-joined strings, variants as a list or a JSON string
+def split_list(value):
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(",") if item.strip()]
+    return list(value or [])
+
+def parse_variants(value):
+    # A list of {"name", "price", "sku"} objects, or the same list as a JSON string
+    if isinstance(value, str):
+        try:
+            value = json.loads(value) if value else []
+        except ValueError:
+            raise ValueError("variants must be a JSON list of objects")
+    if value is None:
+        return []
+    if not isinstance(value, list) or not all(isinstance(v, dict) for v in value):
+        raise ValueError("variants must be a list of objects")
+    return value
+
+# Full-text search index (SQLite FTS5, external content over the product table)
+SEARCH_COLUMNS = ['product_name', 'category', 'short_description', 'long_description', 'rubber_description']
+SEARCH_WEIGHTS = [10.0, 5.0, 2.0, 1.0, 1.0]  # bm25 weights, same order as SEARCH_COLUMNS
+SEARCH_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+product_fts = table('product_fts', column('rowid'))
+
+def init_search_index():
+    if db.engine.dialect.name != 'sqlite':
+        return False
+    cols = ", ".join(SEARCH_COLUMNS)
+    new_cols = ", ".join(f"new.{c}" for c in SEARCH_COLUMNS)
+    old_cols = ", ".join(f"old.{c}" for c in SEARCH_COLUMNS)
+    try:
+        with db.engine.begin() as conn:
+            exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'product_fts'")).first()
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS product_fts USING fts5({cols}, "
+                f"content='product', content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS product_fts_ai AFTER INSERT ON product BEGIN "
+                f"INSERT INTO product_fts(rowid, {cols}) VALUES (new.id, {new_cols}); END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS product_fts_ad AFTER DELETE ON product BEGIN "
+                f"INSERT INTO product_fts(product_fts, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS product_fts_au AFTER UPDATE OF {cols} ON product BEGIN "
+                f"INSERT INTO product_fts(product_fts, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); "
+                f"INSERT INTO product_fts(rowid, {cols}) VALUES (new.id, {new_cols}); END"
+            ))
+            if not exists:
+                conn.execute(text("INSERT INTO product_fts(product_fts) VALUES ('rebuild')"))
+    except Exception as e:
+        # FTS5 is compiled into nearly every SQLite build, but fall back to ILIKE scans if it isn't
+        app.logger.warning("Full-text search index unavailable, using ILIKE search: %s", e)
+        return False
+    return True
+
+def rebuild_search_index():
+    with db.engine.begin() as conn:
+        conn.execute(text("INSERT INTO product_fts(product_fts) VALUES ('rebuild')"))
+        conn.execute(text("INSERT INTO product_fts(product_fts) VALUES ('optimize')"))
+
+def ranked_search(query):
+    # Punctuation-only queries (e.g. "-") have no FTS terms, so they keep the unranked substring match
+    return bool(query and SEARCH_TOKEN_RE.findall(query) and app.config.get('FTS_ENABLED'))
+
+def apply_search(product_query, query):
+    terms = SEARCH_TOKEN_RE.findall(query)
+    if not ranked_search(query):
+        return product_query.filter(
+            Product.product_name.ilike(f'%{query}%') |
+            Product.category.ilike(f'%{query}%') |
+            Product.short_description.ilike(f'%{query}%') |
+            Product.long_description.ilike(f'%{query}%') |
+            Product.rubber_description.ilike(f'%{query}%')
+        )
+    # Every term must match; the last term is what the user is still typing, but prefix-match all of them
+    match = " ".join(f'"{term}"*' for term in terms)
+    fts = literal_column('product_fts')
+    return (product_query
+            .join(product_fts, product_fts.c.rowid == Product.id)
+            .filter(fts.op('MATCH')(match))
+            .order_by(func.bm25(fts, *SEARCH_WEIGHTS), Product.id))
+
+# Rubber dimension search (SQLite R*Tree over the rubber_* columns, kept current by triggers)
+DIMENSIONS = ['density', 'height', 'length', 'thickness']
+DIMENSION_MISSING = -1e30  # stands in for NULL in the R*Tree
+DIMENSION_FLOOR = -1e29  # open-ended ranges start here, above the NULL stand-in
+
+product_dims = table('product_dims', column('id'), *[column(f"{bound}_{d}") for d in DIMENSIONS for bound in ('min', 'max')])
+
+def dimension_values(row):
+    # Products are points: min and max of every dimension are the same value
+    return ", ".join(f"COALESCE({row}.rubber_{d}, {DIMENSION_MISSING}), COALESCE({row}.rubber_{d}, {DIMENSION_MISSING})"
+                     for d in DIMENSIONS)
+
+def has_dimensions(row):
+    return " OR ".join(f"{row}.rubber_{d} IS NOT NULL" for d in DIMENSIONS)
+
+def init_dimension_index():
+    if db.engine.dialect.name != 'sqlite':
+        return False
+    cols = ", ".join(f"min_{d}, max_{d}" for d in DIMENSIONS)
+    watched = ", ".join(f"rubber_{d}" for d in DIMENSIONS)
+    insert_new = f"INSERT INTO product_dims SELECT new.id, {dimension_values('new')} WHERE {has_dimensions('new')};"
+    try:
+        with db.engine.begin() as conn:
+            exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'product_dims'")).first()
+            conn.execute(text(f"CREATE VIRTUAL TABLE IF NOT EXISTS product_dims USING rtree(id, {cols})"))
+            conn.execute(text(f"CREATE TRIGGER IF NOT EXISTS product_dims_ai AFTER INSERT ON product BEGIN {insert_new} END"))
+            conn.execute(text(
+                "CREATE TRIGGER IF NOT EXISTS product_dims_ad AFTER DELETE ON product BEGIN "
+                "DELETE FROM product_dims WHERE id = old.id; END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS product_dims_au AFTER UPDATE OF {watched} ON product BEGIN "
+                f"DELETE FROM product_dims WHERE id = old.id; {insert_new} END"
+            ))
+            if not exists:
+                rebuild_dimension_index(conn)
+    except Exception as e:
+        # R*Tree ships with standard SQLite builds; without it the range filters scan the product table
+        app.logger.warning("Dimension index unavailable, filtering rubber dimensions by scan: %s", e)
+        return False
+    return True
+
+def rebuild_dimension_index(conn):
+    conn.execute(text("DELETE FROM product_dims"))
+    conn.execute(text(
+        f"INSERT INTO product_dims SELECT id, {dimension_values('product')} FROM product WHERE {has_dimensions('product')}"
+    ))
+
+def dimension_ranges(args):
+    # {dimension: (low, high)} for every min_<dimension> / max_<dimension> argument
+    ranges = {}
+    for d in DIMENSIONS:
+        low, high = args.get(f'min_{d}', type=float), args.get(f'max_{d}', type=float)
+        if low is not None or high is not None:
+            ranges[d] = (low, high)
+    return ranges
+
+def dimension_targets(args):
+    return {d: args.get(f'near_{d}', type=float) for d in DIMENSIONS if args.get(f'near_{d}', type=float) is not None}
+
+def within_dimensions(product_query, ranges):
+    # The exact column filters always apply; the R*Tree (float32, rounded outwards) narrows the candidates first
+    if not ranges:
+        return product_query
+    for d, (low, high) in ranges.items():
+        value = getattr(Product, f'rubber_{d}')
+        if low is not None:
+            product_query = product_query.filter(value >= low)
+        if high is not None:
+            product_query = product_query.filter(value <= high)
+    if not app.config.get('DIMENSIONS_ENABLED'):
+        return product_query
+    dims = product_dims.alias()
+    box = []
+    for d, (low, high) in ranges.items():
+        box.append(dims.c[f'max_{d}'] >= (DIMENSION_FLOOR if low is None else low))
+        if high is not None:
+            box.append(dims.c[f'min_{d}'] <= high)
+    return product_query.join(dims, dims.c.id == Product.id).filter(*box)
+
+def nearest_dimensions(product_query, targets, needed):
+    # Orders by relative distance to the target dimensions (so a 2mm miss counts for more on a
+    # 5mm thickness than on a 2000mm length). With the R*Tree, a box around the target is grown
+    # until it holds `needed` products, then sized to the needed-th distance so no closer product
+    # outside it is missed. Products missing a targeted dimension must already be filtered out.
+    scales = {d: abs(t) or 1.0 for d, t in targets.items()}
+    terms = [((getattr(Product, f'rubber_{d}') - t) / scales[d]) * ((getattr(Product, f'rubber_{d}') - t) / scales[d])
+             for d, t in targets.items()]
+    distance = sum(terms[1:], terms[0])
+
+    def box(radius):
+        return within_dimensions(product_query, {d: (t - radius * scales[d], t + radius * scales[d]) for d, t in targets.items()})
+
+    radius = app.config['NEAREST_START_RADIUS']
+    while app.config.get('DIMENSIONS_ENABLED') and radius <= app.config['NEAREST_MAX_RADIUS']:
+        candidates = box(radius).order_by(None)
+        if candidates.count() >= needed:
+            farthest = candidates.with_entities(distance).order_by(distance).offset(needed - 1).limit(1).scalar()
+            # sqrt and the bound arithmetic round; without the slack the needed-th product can fall
+            # just outside the box that was sized to hold it
+            product_query = box(math.sqrt(farthest) * (1 + NEAREST_BOX_SLACK) + NEAREST_BOX_SLACK)
+            break
+        radius *= 4
+    return product_query.order_by(None).order_by(distance, Product.id)
+
+# Listing filters shared by index() and /facets
+FILTER_ARGS = ['q', 'category', 'in_stock', 'min_price', 'max_price'] + [
+    f"{bound}_{d}" for d in DIMENSIONS for bound in ('min', 'max')
+]
+
+def filter_products(args, exclude=()):
+    query = args.get('q', '').lower()
+    category = args.get('category', '')
+    in_stock = args.get('in_stock', '')
+    min_price = args.get('min_price', type=float)
+    max_price = args.get('max_price', type=float)
+
+    product_query = Product.query
+    if query and 'q' not in exclude:
+        product_query = apply_search(product_query, query)
+    if category and 'category' not in exclude:
+        product_query = product_query.filter(Product.category == category)
+    if in_stock and 'in_stock' not in exclude:
+        product_query = product_query.filter(Product.in_stock == (in_stock == 'true'))
+    if min_price is not None and 'price' not in exclude:
+        product_query = product_query.filter(Product.offer_price >= min_price)
+    if max_price is not None and 'price' not in exclude:
+        product_query = product_query.filter(Product.offer_price <= max_price)
+    ranges = dimension_ranges(args)
+    if ranges and 'dimensions' not in exclude:
+        product_query = within_dimensions(product_query, ranges)
+    return product_query
+
+def has_filters(args, exclude=()):
+    names = {'min_price': 'price', 'max_price': 'price'}
+    return any(args.get(name) and names.get(name, name) not in exclude for name in FILTER_ARGS)
+
+# Facet counts: the summary table answers unfiltered counts; filtered ones are GROUP BYs over the filtered set
+FACET_VALUE_SQL = {
+    'category': "COALESCE({row}.category, '')",
+    'in_stock': "CASE WHEN {row}.in_stock THEN 'true' ELSE 'false' END",
+    # floor() without relying on SQLite's optional math functions: CAST truncates toward zero, so step
+    # negative prices down one more bucket
+    'price': "CASE WHEN {row}.offer_price IS NULL THEN '' ELSE CAST((CAST({row}.offer_price / {width} AS INTEGER) - "
+             "({row}.offer_price / {width} < CAST({row}.offer_price / {width} AS INTEGER))) * {width} AS TEXT) END",
+}
+
+def init_facet_summary():
+    if db.engine.dialect.name != 'sqlite':
+        return False
+    width = app.config['FACET_PRICE_BUCKET']
+    values = {facet: sql.replace('{width}', str(width)) for facet, sql in FACET_VALUE_SQL.items()}
+
+    def bump(row, delta):
+        return " ".join(
+            f"INSERT INTO facet_count(facet, value, count) VALUES ('{facet}', {sql.format(row=row)}, {delta}) "
+            f"ON CONFLICT(facet, value) DO UPDATE SET count = count + ({delta});"
+            for facet, sql in values.items()
+        )
+
+    with db.engine.begin() as conn:
+        current = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'facet_count_ai'")).scalar()
+        if current and values['price'].format(row='new') in current:
+            return True
+        # First run, or the bucket width changed: recreate the triggers and recount once
+        for suffix in ('ai', 'ad', 'au'):
+            conn.execute(text(f"DROP TRIGGER IF EXISTS facet_count_{suffix}"))
+        conn.execute(text(f"CREATE TRIGGER facet_count_ai AFTER INSERT ON product BEGIN {bump('new', 1)} END"))
+        conn.execute(text(f"CREATE TRIGGER facet_count_ad AFTER DELETE ON product BEGIN {bump('old', -1)} END"))
+        conn.execute(text(
+            f"CREATE TRIGGER facet_count_au AFTER UPDATE OF category, in_stock, offer_price ON product BEGIN "
+            f"{bump('old', -1)} {bump('new', 1)} END"
+        ))
+        rebuild_facet_summary(conn)
+    return True
+
+def rebuild_facet_summary(conn):
+    width = app.config['FACET_PRICE_BUCKET']
+    conn.execute(text("DELETE FROM facet_count"))
+    for facet, sql in FACET_VALUE_SQL.items():
+        value = sql.replace('{width}', str(width)).format(row='product')
+        conn.execute(text(
+            f"INSERT INTO facet_count(facet, value, count) SELECT '{facet}', {value}, COUNT(*) FROM product GROUP BY 2"
+        ))
+
+def facet_counts(args, facet, column):
+    exclude = (facet,)
+    if not has_filters(args, exclude) and app.config.get('FACETS_ENABLED'):
+        rows = db.session.query(FacetCount.value, FacetCount.count).filter(FacetCount.facet == facet, FacetCount.count > 0)
+        return {value: count for value, count in rows}
+    product_query = filter_products(args, exclude).order_by(None)
+    rows = product_query.with_entities(column, func.count()).group_by(column)
+    return {'' if value is None else str(value): count for value, count in rows}
+
+def compute_facets(args):
+    width = app.config['FACET_PRICE_BUCKET']
+    categories = facet_counts(args, 'category', Product.category)
+    stock = facet_counts(args, 'in_stock', db.case((Product.in_stock, 'true'), else_='false'))
+    quotient = Product.offer_price / width
+    floored = db.cast(quotient, db.Integer) - db.case((quotient < db.cast(quotient, db.Integer), 1), else_=0)
+    bucket = db.case((Product.offer_price.is_(None), ''), else_=db.cast(floored * width, db.String))
+    prices = facet_counts(args, 'price', bucket)
+    return {
+        "categories": [{"value": value, "count": count} for value, count in sorted(categories.items()) if value],
+        "stock": {"in_stock": stock.get('true', 0), "out_of_stock": stock.get('false', 0)},
+        "price_buckets": sorted(
+            ({"min": int(value), "max": int(value) + width, "count": count} for value, count in prices.items() if value),
+            key=lambda bucket: bucket["min"]
+        ),
+        "bucket_width": width
+    }
+
+# Pagination helpers
+count_cache = {}
+
+def paginate_products(product_query, args, page, per_page, fields=None):
+    targets = dimension_targets(args)
+    if not targets:
+        return with_fields(product_query, fields).paginate(page=page, per_page=per_page, error_out=False)
+    # A near_* query only ranks the rows up to this page; the total still counts every match
+    product_query = product_query.filter(*[getattr(Product, f'rubber_{d}').isnot(None) for d in targets])
+    if app.config.get('DIMENSIONS_ENABLED') and not has_filters(args):
+        # Nothing else narrows the listing, so the R*Tree alone can count products with these dimensions
+        total = (db.session.query(func.count()).select_from(product_dims)
+                 .filter(*[product_dims.c[f'max_{d}'] >= DIMENSION_FLOOR for d in targets]).scalar())
+    else:
+        filters = tuple(sorted((k, v) for k, v in args.items(multi=True) if k in FILTER_ARGS))
+        total = cached_count(('nearest', filters, tuple(sorted(targets))), product_query)
+    ranked = nearest_dimensions(product_query, targets, page * per_page)
+    pagination = with_fields(ranked, fields).paginate(page=page, per_page=per_page, error_out=False, count=False)
+    pagination.total = total
+    return pagination
+
+def page_size(name, default):
+    size = request.args.get(name, default, type=int) or default
+    return max(1, min(size, app.config['MAX_PER_PAGE']))
+
+def encode_cursor(last_id):
+    raw = json.dumps({"id": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        return int(json.loads(raw)["id"])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+def cached_count(key, product_query):
+    now = time.monotonic()
+    key = (current_change_version(), key)
+    hit = count_cache.get(key)
+    if hit and hit[0] > now:
+        return hit[1]
+    total = product_query.order_by(None).count()
+    if len(count_cache) > 1000:
+        count_cache.clear()
+    count_cache[key] = (now + app.config['COUNT_CACHE_TTL'], total)
+    return total
+
+def is_cursor_request():
+    return 'after' in request.args or 'limit' in request.args
+
+def cursor_arg():
+    # The decoded ?after= id, or None; raises ValueError for a malformed cursor
+    after = request.args.get('after', '')
+    return decode_cursor(after) if after else None
+
+def cursor_page(product_query, count_key, fields=None, after=None):
+    # Seek on the primary key instead of OFFSET so every page costs the same
+    limit = page_size('limit', 10)
+    page_query = product_query.order_by(None).order_by(Product.id)
+    if after is not None:
+        page_query = page_query.filter(Product.id > after)
+    items = page_query.limit(limit + 1).all()
+    has_more = len(items) > limit
+    items = items[:limit]
+    body = {
+        "products": [p.to_dict(fields) for p in items],
+        "next_cursor": encode_cursor(items[-1].id) if has_more else None,
+        "limit": limit
+    }
+    # COUNT(*) is the expensive part of a page, so only run it on request and reuse it for a while
+    if request.args.get('count') == 'true':
+        body["total_items"] = cached_count(count_key, product_query)
+    return body
+
+# Serialized response cache for product reads
+class ResponseCache:
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                self.entries.pop(key, None)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1:]
+
+    def set(self, key, body, etag, last_modified):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, body, etag, last_modified)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+response_cache = ResponseCache(app.config['RESPONSE_CACHE_SIZE'], app.config['RESPONSE_CACHE_TTL'])
+
+class FragmentCache:
+    # LRU without a TTL: keys carry a product version or content hash, so entries never go stale
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+card_cache = FragmentCache(app.config['CARD_CACHE_SIZE'])  # (product id, change_version) -> rendered card
+compressed_cache = FragmentCache(app.config['COMPRESSED_CACHE_SIZE'])  # (etag, encoding) -> compressed body
+
+def invalidate_product_cache():
+    response_cache.clear()
+    count_cache.clear()
+    suggest_index.changed.set()  # pick up this worker's own write without waiting for the next poll
+
+def last_modified_of(products):
+    stamps = [p['updated_at'] for p in products if p.get('updated_at')]
+    return datetime.fromisoformat(max(stamps)) if stamps else None
+
+def cached_json_response(build):
+    # build() returns the payload and the product dicts whose updated_at drives Last-Modified.
+    # List responses pass none: deleting a row wouldn't move their max(updated_at), so If-Modified-Since
+    # could answer a stale 304; they rely on the ETag instead.
+    # invalidate_product_cache() only clears this worker's cache; keying on the change version
+    # makes every worker miss once any worker has written
+    key = (current_change_version(), request.full_path)
+    cached = response_cache.get(key)
+    if cached is None:
+        payload, products = build()
+        body = dumps_json(payload)
+        cached = (body, hashlib.sha1(body).hexdigest(), last_modified_of(products))
+        response_cache.set(key, *cached)
+        cache_status = 'MISS'
+    else:
+        cache_status = 'HIT'
+    body, etag, last_modified = cached
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = app.config['API_CACHE_CONTROL']
+    response.headers['X-Cache'] = cache_status
+    return response.make_conditional(request)
+
+# Autocomplete: an in-memory phrase/word/trigram index per worker process, built on first use and then
+# kept current by a background thread that follows the change feed, so /suggest never queries the database
+SUGGEST_FIELDS = ['product_name', 'sku', 'manufacturer', 'category']  # also the ranking order
+
+def normalize_phrase(value):
+    return " ".join(value.lower().split())
+
+def trigrams(word):
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class SuggestIndex:
+    def __init__(self, max_phrases, max_products, max_length):
+        self.max_phrases = max_phrases
+        self.max_products = max_products
+        self.max_length = max_length
+        self.thread = None
+        self.pid = None
+        self.start_lock = threading.Lock()
+        self.ready = threading.Event()
+        self.changed = threading.Event()
+        self.reset()
+
+    def reset(self):
+        # An empty index: after a failed load, and in a forked worker whose copy may hold a dead thread's lock
+        self.lock = threading.RLock()
+        self.products = {}  # product_id -> indexed field values
+        self.phrases = {}  # (normalized text, field) -> [display text, set of product ids]
+        self.rank = {}  # phrase key -> sort key: field order, then shorter phrases first
+        self.sorted_phrases = []  # phrase keys, for prefix ranges over whole phrases
+        self.postings = {}  # word -> set of phrase keys
+        self.ranked = {}  # word -> the same phrase keys in rank order
+        self.sorted_words = []  # for prefix ranges over words
+        self.trigrams = {}  # trigram -> set of words, for typo tolerance
+        self.version = 0
+        self.full = False
+        self.products_full = False
+
+    def add_phrase(self, product_id, field, text):
+        key = (normalize_phrase(text)[:self.max_length], field)
+        if not key[0]:
+            return
+        entry = self.phrases.get(key)
+        if entry is None:
+            if len(self.phrases) >= self.max_phrases:
+                if not self.full:
+                    app.logger.warning("Suggest index is full (%s phrases), new phrases are skipped", self.max_phrases)
+                    self.full = True
+                return
+            entry = self.phrases[key] = [text.strip()[:self.max_length], set()]
+            self.rank[key] = (SUGGEST_FIELDS.index(field), len(key[0]), key[0])
+            if self.ready.is_set():
+                bisect.insort(self.sorted_phrases, key)
+            for word in set(SEARCH_TOKEN_RE.findall(key[0])):
+                postings = self.postings.get(word)
+                if postings is None:
+                    postings = self.postings[word] = set()
+                    self.ranked[word] = []
+                    if self.ready.is_set():
+                        bisect.insort(self.sorted_words, word)
+                    for trigram in trigrams(word):
+                        self.trigrams.setdefault(trigram, set()).add(word)
+                postings.add(key)
+                if self.ready.is_set():
+                    bisect.insort(self.ranked[word], key, key=self.rank.__getitem__)
+                else:
+                    self.ranked[word].append(key)
+        entry[1].add(product_id)
+
+    def remove_phrase(self, product_id, field, text):
+        key = (normalize_phrase(text)[:self.max_length], field)
+        entry = self.phrases.get(key)
+        if entry is None:
+            return
+        entry[1].discard(product_id)
+        if entry[1]:
+            return
+        del self.phrases[key]
+        rank = self.rank[key]
+        self.full = False
+        index = bisect.bisect_left(self.sorted_phrases, key)
+        if index < len(self.sorted_phrases) and self.sorted_phrases[index] == key:
+            del self.sorted_phrases[index]
+        for word in set(SEARCH_TOKEN_RE.findall(key[0])):
+            postings = self.postings.get(word)
+            if postings is None:
+                continue
+            postings.discard(key)
+            ranked = self.ranked[word]
+            index = bisect.bisect_left(ranked, rank, key=self.rank.__getitem__)
+            if index < len(ranked) and ranked[index] == key:
+                del ranked[index]
+            if postings:
+                continue
+            del self.postings[word]
+            del self.ranked[word]
+            index = bisect.bisect_left(self.sorted_words, word)
+            if index < len(self.sorted_words) and self.sorted_words[index] == word:
+                del self.sorted_words[index]
+            for trigram in trigrams(word):
+                words = self.trigrams.get(trigram)
+                if words is not None:
+                    words.discard(word)
+                    if not words:
+                        del self.trigrams[trigram]
+        del self.rank[key]
+
+    def put(self, product_id, values):
+        with self.lock:
+            self.delete(product_id)
+            if len(self.products) >= self.max_products:
+                if not self.products_full:
+                    app.logger.warning("Suggest index is full (%s products), new products are skipped", self.max_products)
+                    self.products_full = True
+                return
+            values = tuple(values)
+            self.products[product_id] = values
+            for field, value in zip(SUGGEST_FIELDS, values):
+                if value:
+                    self.add_phrase(product_id, field, value)
+
+    def delete(self, product_id):
+        with self.lock:
+            old = self.products.pop(product_id, None)
+            if old is not None:
+                self.products_full = False
+            for field, value in zip(SUGGEST_FIELDS, old or ()):
+                if value:
+                    self.remove_phrase(product_id, field, value)
+
+    def prefix_range(self, items, probe, prefix, limit, key=lambda item: item):
+        # Up to limit items of a sorted list whose key starts with prefix; probe sorts just before them
+        found = []
+        for i in range(bisect.bisect_left(items, probe), len(items)):
+            if len(found) >= limit or not key(items[i]).startswith(prefix):
+                break
+            found.append(items[i])
+        return found
+
+    def matching_words(self, token, limit):
+        # Words starting with the token; if none, words that share enough trigrams with it
+        words = self.prefix_range(self.sorted_words, token, token, limit)
+        if words or len(token) < 3:
+            return words
+        counts = {}
+        for trigram in trigrams(token):
+            for word in self.trigrams.get(trigram, ()):
+                counts[word] = counts.get(word, 0) + 1
+        wanted = len(trigrams(token))
+        scored = [(shared / (wanted + len(trigrams(word)) - shared), word) for word, shared in counts.items()]
+        return [word for score, word in sorted(scored, reverse=True)[:limit] if score >= app.config['SUGGEST_MIN_SIMILARITY']]
+
+    def word_matches(self, query, limit, exclude):
+        # Best ranked phrases containing, for every query token, a word it prefixes (or resembles)
+        words_by_token = []
+        for token in dict.fromkeys(SEARCH_TOKEN_RE.findall(query)):
+            words = self.matching_words(token, app.config['SUGGEST_WORD_LIMIT'])
+            if not words:
+                return []
+            words_by_token.append(words)
+        if not words_by_token:
+            return []
+        if len(words_by_token) == 1:
+            # Merge the heads of the rank-ordered lists instead of ranking every phrase of every word
+            found = []
+            for key in heapq.merge(*(self.ranked[word] for word in words_by_token[0]), key=self.rank.__getitem__):
+                if len(found) >= limit:
+                    break
+                if key not in exclude and key not in found:
+                    found.append(key)
+            return found
+        postings_by_token = [[self.postings[word] for word in words] for words in words_by_token]
+        # Start from the most selective token; set intersections then only walk the smaller side
+        postings_by_token.sort(key=lambda postings: sum(map(len, postings)))
+        candidates = set().union(*postings_by_token[0])
+        for postings in postings_by_token[1:]:
+            if len(postings) == 1:
+                candidates &= postings[0]
+            else:
+                candidates = set().union(*(candidates & phrase_keys for phrase_keys in postings))
+            if not candidates:
+                break
+        candidates.difference_update(exclude)
+        return heapq.nsmallest(limit, candidates, key=self.rank.__getitem__)
+
+    def suggest(self, query, limit):
+        query = normalize_phrase(query)[:self.max_length]
+        if not query:
+            return []
+        with self.lock:
+            # Phrases starting with the query rank first, then phrases matching every token
+            prefixed = self.prefix_range(self.sorted_phrases, (query,), query, app.config['SUGGEST_SCAN_LIMIT'],
+                                         key=lambda key: key[0])
+            best = heapq.nsmallest(limit, prefixed, key=self.rank.__getitem__)
+            if len(best) < limit:
+                best += self.word_matches(query, limit - len(best), best)
+            suggestions = []
+            for key in best:
+                display, ids = self.phrases[key]
+                suggestion = {"text": display, "field": key[1], "count": len(ids)}
+                if len(ids) == 1:
+                    suggestion["product_id"] = next(iter(ids))
+                suggestions.append(suggestion)
+            return suggestions
+
+    def load(self):
+        # Read the version before scanning, so rows changed during the scan are replayed by refresh()
+        with app.app_context():
+            version = current_change_version()
+            columns = [Product.id] + [getattr(Product, f) for f in SUGGEST_FIELDS]
+            rows = db.session.query(*columns).yield_per(app.config['EXPORT_BATCH_SIZE'])
+            with self.lock:
+                for row in rows:
+                    self.put(row[0], row[1:])
+                self.sorted_phrases = sorted(self.phrases)
+                self.sorted_words = sorted(self.postings)
+                for ranked in self.ranked.values():
+                    ranked.sort(key=self.rank.__getitem__)
+                self.version = version
+                self.ready.set()
+            db.session.remove()
+
+    def refresh(self):
+        # Apply upserts and tombstones from the change feed; covers writes made by every worker
+        batch = app.config['EXPORT_BATCH_SIZE']
+        with app.app_context():
+            while True:
+                columns = [Product.id, Product.change_version] + [getattr(Product, f) for f in SUGGEST_FIELDS]
+                rows = (db.session.query(*columns).filter(Product.change_version > self.version)
+                        .order_by(Product.change_version).limit(batch).all())
+                tombstones = (db.session.query(ProductTombstone.product_id, ProductTombstone.change_version)
+                              .filter(ProductTombstone.change_version > self.version)
+                              .order_by(ProductTombstone.change_version).limit(batch).all())
+                changes = sorted([(row[1], row[0], row[2:]) for row in rows] +
+                                 [(version, product_id, None) for product_id, version in tombstones],
+                                 key=lambda change: change[0])[:batch]
+                with self.lock:
+                    for version, product_id, values in changes:
+                        if values is None:
+                            self.delete(product_id)
+                        else:
+                            self.put(product_id, values)
+                        self.version = version
+                if len(changes) < batch:
+                    break
+            db.session.remove()
+
+    def ensure_started(self):
+        # Started by a serving process's first request, so CLI commands and scripts that import the app
+        # never build it; a worker forked from a process that already had one rebuilds its own
+        if self.pid == os.getpid():
+            return
+        with self.start_lock:
+            if self.thread is None or self.pid != os.getpid():
+                if self.pid is not None:
+                    self.ready, self.changed = threading.Event(), threading.Event()
+                    self.reset()
+                self.pid = os.getpid()
+                self.thread = threading.Thread(target=self.run, name='suggest-index', daemon=True)
+                self.thread.start()
+
+    def run(self):
+        # Until a full load succeeds /suggest answers 503; replaying the whole catalog through
+        # refresh() would insert every phrase one by one into the sorted lists
+        while True:
+            try:
+                self.load()
+                break
+            except Exception as e:
+                app.logger.error("Error building suggest index, retrying: %s", e)
+                with self.lock:
+                    self.reset()
+                time.sleep(app.config['SUGGEST_REFRESH_INTERVAL'])
+        while True:
+            self.changed.wait(app.config['SUGGEST_REFRESH_INTERVAL'])
+            self.changed.clear()
+            try:
+                self.refresh()
+            except Exception as e:
+                app.logger.error("Error refreshing suggest index: %s", e)
+
+suggest_index = SuggestIndex(app.config['SUGGEST_MAX_PHRASES'], app.config['SUGGEST_MAX_PRODUCTS'],
+                             app.config['SUGGEST_MAX_LENGTH'])
+
+# Schema changes create_all() can't apply to an existing database
+SCHEMA_COLUMNS = [
+    ('product', 'updated_at', "DATETIME"),
+    ('product', 'change_version', "BIGINT"),
+    ('product', 'stock_reserved', "INTEGER NOT NULL DEFAULT 0"),
+]
+SCHEMA_MIGRATIONS = [
+    "CREATE INDEX IF NOT EXISTS ix_product_sku ON product (sku)",
+    "UPDATE product SET updated_at = CURRENT_TIMESTAMP WHERE updated_at IS NULL",
+    "CREATE INDEX IF NOT EXISTS ix_product_change_version ON product (change_version)",
+    # Rows written before the change feed (or by raw SQL) get versions above the current sequence
+    "INSERT INTO change_sequence (id, version) SELECT 1, 0 WHERE NOT EXISTS (SELECT 1 FROM change_sequence)",
+    "UPDATE product SET change_version = id + (SELECT version FROM change_sequence WHERE change_sequence.id = 1) "
+    "WHERE change_version IS NULL",
+    "UPDATE change_sequence SET version = (SELECT MAX(change_version) FROM product) "
+    "WHERE version < (SELECT MAX(change_version) FROM product)",
+]
+
+def migrate_schema():
+    with db.engine.begin() as conn:
+        inspector = inspect(conn)
+        for table_name, column_name, ddl in SCHEMA_COLUMNS:
+            if column_name not in [c['name'] for c in inspector.get_columns(table_name)]:
+                conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {ddl}"))
+        for statement in SCHEMA_MIGRATIONS:
+            conn.execute(text(statement))
+    migrate_legacy_media()
+
+# Move comma-joined / JSON columns from older databases into the child tables
+LEGACY_MEDIA_COLUMNS = ['variants', 'download_pdfs', 'product_image_urls', 'youtube_links', 'product_image_renditions']
+
+def migrate_legacy_media(batch_size=500):
+    with db.engine.begin() as conn:
+        present = [c['name'] for c in inspect(conn).get_columns('product')]
+        legacy = [c for c in LEGACY_MEDIA_COLUMNS if c in present]
+        if not legacy:
+            return
+        pending = " OR ".join(f"{c} IS NOT NULL" for c in legacy)
+        while True:
+            rows = conn.execute(text(f"SELECT id, {', '.join(legacy)} FROM product WHERE {pending} LIMIT {batch_size}")).mappings().all()
+            if not rows:
+                break
+            variants, images, pdfs, videos = [], [], [], []
+            for row in rows:
+                renditions = json.loads(row.get('product_image_renditions') or '{}')
+                for i, v in enumerate(json.loads(row.get('variants') or '[]')):
+                    variants.append({"product_id": row['id'], "position": i, "name": v.get('name'), "price": v.get('price'), "sku": v.get('sku')})
+                for i, url in enumerate(split_list(row.get('product_image_urls'))):
+                    r = renditions.get(url)
+                    images.append({"product_id": row['id'], "position": i, "url": url, "renditions": json.dumps(r) if r else None})
+                for i, url in enumerate(split_list(row.get('download_pdfs'))):
+                    pdfs.append({"product_id": row['id'], "position": i, "url": url})
+                for i, url in enumerate(split_list(row.get('youtube_links'))):
+                    videos.append({"product_id": row['id'], "position": i, "url": url})
+            for model, child_rows in ((ProductVariant, variants), (ProductImage, images), (ProductPdf, pdfs), (ProductVideo, videos)):
+                if child_rows:
+                    conn.execute(model.__table__.insert(), child_rows)
+            ids = ", ".join(str(row['id']) for row in rows)
+            conn.execute(text(f"UPDATE product SET {', '.join(f'{c} = NULL' for c in legacy)} WHERE id IN ({ids})"))
+
+# pysqlite opens and commits transactions on its own: a SAVEPOINT sent first opens one and its RELEASE
+# commits it. SQLAlchemy's documented recipe hands transaction control back to the engine instead.
+sqlite_write = threading.local()
+
+def disable_pysqlite_transactions(dbapi_connection, connection_record):
+    dbapi_connection.isolation_level = None
+
+def begin_sqlite(conn):
+    # Writes take the write lock up front: under WAL a deferred transaction that reads and then writes
+    # can fail with SQLITE_BUSY_SNAPSHOT, which the busy timeout doesn't retry. Reads stay deferred
+    # so they don't queue behind each other.
+    conn.exec_driver_sql("BEGIN IMMEDIATE" if getattr(sqlite_write, 'active', False) else "BEGIN")
+
+def write_transaction(fn):
+    # Runs fn with the session's next transaction started as a write transaction
+    sqlite_write.active = True
+    try:
+        return fn()
+    finally:
+        sqlite_write.active = False
+
+# SQLite tuning, applied to every new connection in production mode
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in app.config['SQLITE_PRAGMAS'].items():
+        cursor.execute(f"PRAGMA {name} = {value}")
+    cursor.close()
+
+# Single writer per process: API writes are queued and committed together in small batches
+class WriteQueue:
+    def __init__(self, batch_size, window):
+        self.batch_size = batch_size
+        self.window = window
+        self.jobs = queue.Queue()
+        self.thread = None
+        self.pid = None
+        self.lock = threading.Lock()
+
+    def submit(self, fn):
+        self.ensure_started()
+        future = Future()
+        self.jobs.put((fn, future))
+        return future
+
+    def ensure_started(self):
+        # The thread does not survive a gunicorn fork, so start one per worker process
+        with self.lock:
+            if self.thread is None or self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.thread = threading.Thread(target=self.run, name='write-queue', daemon=True)
+                self.thread.start()
+
+    def next_batch(self):
+        batch = [self.jobs.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self.jobs.get(timeout=remaining) if remaining > 0 else self.jobs.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        while True:
+            batch = self.next_batch()
+            with app.app_context():
+                results = write_transaction(lambda: self.run_batch(batch))
+                for future, result, error in results:
+                    if error is not None:
+                        future.set_exception(error)
+                    else:
+                        future.set_result(result)
+
+    def run_batch(self, batch):
+        # One transaction, one commit for the whole batch
+        results = []
+        try:
+            for fn, future in batch:
+                # The caller gave up waiting and cancelled it; never run it late
+                if not future.set_running_or_notify_cancel():
+                    continue
+                # A savepoint per job, so one failing write doesn't take the batch down with it
+                try:
+                    with db.session.begin_nested():
+                        results.append((future, fn(), None))
+                except Exception as e:
+                    results.append((future, None, e))
+            db.session.commit()
+        except Exception as e:
+            # The commit failed, so none of the batch was written
+            db.session.rollback()
+            results = [(future, None, e) for _, future in batch if future.running()]
+        return results
+
+write_queue = WriteQueue(app.config['WRITE_BATCH_SIZE'], app.config['WRITE_BATCH_WINDOW'])
+
+class WriteTimeout(Exception):
+    pass
+
+# Every write path (API, UI, bulk, stock, renditions, batch deletes) goes through run_write, so
+# with the queue enabled a worker process never commits from more than one thread
+def run_write(fn):
+    # fn runs inside a transaction and must return plain data, not ORM instances
+    # End the request's read transaction: it would hold SQLite's shared lock against the writer's
+    # commit, and a write starts its own transaction with the write lock held
+    db.session.commit()
+    if not app.config['WRITE_QUEUE_ENABLED']:
+        try:
+            result = write_transaction(fn)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return result
+    future = write_queue.submit(fn)
+    try:
+        return future.result(timeout=app.config['WRITE_TIMEOUT'])
+    except FutureTimeout:
+        # Not started yet: cancel so it never runs. Already running: its outcome is unknown to the caller
+        future.cancel()
+        raise WriteTimeout("Timed out waiting for the database writer")
+
+@app.errorhandler(WriteTimeout)
+def write_timeout(e):
+    response = jsonify({"error": str(e)})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+# Request, SQL and upload metrics in the Prometheus text format, served at /metrics.
+# Values are per worker process: scrape every gunicorn worker, or sum them downstream.
+def format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in labels)
+    return '{' + pairs + '}'
+
+class Metrics:
+    def __init__(self):
+        self.families = OrderedDict()  # name -> (type, help, buckets)
+        self.values = {}  # name -> {labels: value}
+        self.collectors = OrderedDict()  # name -> (type, help, fn), read at scrape time
+        self.lock = threading.Lock()
+
+    def counter(self, name, help_text):
+        self.families[name] = ('counter', help_text, None)
+        self.values[name] = {}
+
+    def histogram(self, name, help_text, buckets):
+        self.families[name] = ('histogram', help_text, tuple(buckets))
+        self.values[name] = {}
+
+    def collector(self, name, kind, help_text, fn):
+        self.collectors[name] = (kind, help_text, fn)
+
+    def inc(self, name, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.values[name]
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        buckets = self.families[name][2]
+        with self.lock:
+            series = self.values[name]
+            state = series.get(key)
+            if state is None:
+                state = series[key] = [[0] * len(buckets), 0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += 1
+            state[2] += value
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for name, (kind, help_text, buckets) in self.families.items():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                for labels, value in self.values[name].items():
+                    if kind != 'histogram':
+                        lines.append(f"{name}{format_labels(labels)} {value}")
+                        continue
+                    counts, count, total = value
+                    cumulative = 0
+                    for bound, n in zip(buckets, counts):
+                        cumulative += n
+                        lines.append(f"{name}_bucket{format_labels(labels + (('le', bound),))} {cumulative}")
+                    lines.append(f"{name}_bucket{format_labels(labels + (('le', '+Inf'),))} {count}")
+                    lines.append(f"{name}_sum{format_labels(labels)} {total}")
+                    lines.append(f"{name}_count{format_labels(labels)} {count}")
+        for name, (kind, help_text, fn) in self.collectors.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {fn()}"]
+        return '\n'.join(lines) + '\n'
+
+metrics = Metrics()
+metrics.counter('http_requests_total', 'HTTP requests by route, method and status.')
+metrics.histogram('http_request_duration_seconds', 'HTTP request latency by route.', app.config['LATENCY_BUCKETS'])
+metrics.histogram('http_request_sql_queries', 'SQL statements executed per HTTP request.', app.config['QUERY_COUNT_BUCKETS'])
+metrics.histogram('http_request_sql_seconds', 'Time spent in SQL per HTTP request.', app.config['LATENCY_BUCKETS'])
+metrics.counter('sql_queries_total', 'SQL statements executed, including background writers.')
+metrics.histogram('sql_query_duration_seconds', 'SQL statement latency.', app.config['LATENCY_BUCKETS'])
+metrics.counter('uploads_total', 'Uploaded files by outcome (stored or deduplicated).')
+metrics.counter('upload_bytes_total', 'Bytes received in uploaded files.')
+metrics.counter('upload_seconds_total', 'Time spent hashing and storing uploaded files.')
+metrics.counter('orphaned_uploads_removed_total', 'Upload files removed after the products using them were deleted.')
+metrics.collector('response_cache_hits_total', 'counter', 'Product read responses served from the cache.', lambda: response_cache.hits)
+metrics.collector('response_cache_misses_total', 'counter', 'Product read responses built from the database.', lambda: response_cache.misses)
+metrics.collector('response_cache_entries', 'gauge', 'Responses currently held in the cache.', lambda: len(response_cache.entries))
+metrics.collector('card_cache_hits_total', 'counter', 'Listing cards served from the fragment cache.', lambda: card_cache.hits)
+metrics.collector('card_cache_misses_total', 'counter', 'Listing cards rendered from the template.', lambda: card_cache.misses)
+metrics.collector('card_cache_entries', 'gauge', 'Rendered cards currently held in the cache.', lambda: len(card_cache.entries))
+
+def debug_sampled(message, *args):
+    # Hot-path debug logs: free unless DEBUG is on, and only a sample of them is formatted;
+    # callable args are evaluated only for the lines that are written
+    if not app.logger.isEnabledFor(logging.DEBUG) or random.random() >= app.config['LOG_SAMPLE_RATE']:
+        return
+    app.logger.debug(message, *(arg() if callable(arg) else arg for arg in args))
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_started
+    metrics.inc('sql_queries_total')
+    metrics.observe('sql_query_duration_seconds', elapsed)
+    # Writes committed by the write queue thread have no request to be charged to
+    if has_request_context() and 'sql_queries' in g:
+        g.sql_queries += 1
+        g.sql_seconds += elapsed
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    g.sql_queries = 0
+    g.sql_seconds = 0.0
+
+@app.after_request
+def record_request_metrics(response):
+    if 'request_started' not in g:
+        return response
+    # Streamed responses (exports) are timed up to the first byte
+    elapsed = time.perf_counter() - g.request_started
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.inc('http_requests_total', route=route, method=request.method, status=response.status_code)
+    metrics.observe('http_request_duration_seconds', elapsed, route=route, method=request.method)
+    metrics.observe('http_request_sql_queries', g.sql_queries, route=route, method=request.method)
+    metrics.observe('http_request_sql_seconds', g.sql_seconds, route=route, method=request.method)
+    debug_sampled("%s %s -> %s in %.1fms, %s queries", request.method, request.path,
+                  response.status_code, elapsed * 1000, g.sql_queries)
+    return response
 
 # Create DB
 with app.app_context():
+    if db.engine.dialect.name == 'sqlite':
+        event.listen(db.engine, 'connect', disable_pysqlite_transactions)
+        event.listen(db.engine, 'begin', begin_sqlite)
+        if app.config['STORAGE_MODE'] == 'production':
+            event.listen(db.engine, 'connect', set_sqlite_pragmas)
+        db.engine.dispose()  # drop any connection opened before the listeners existed
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    event.listen(db.engine, 'after_cursor_execute', after_cursor_execute)
     db.create_all()
+    migrate_schema()
+    app.config['FTS_ENABLED'] = init_search_index()
+    app.config['FACETS_ENABLED'] = init_facet_summary()
+    app.config['DIMENSIONS_ENABLED'] = init_dimension_index()
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Rebuild the full-text search index from the product table."""
+    if not app.config.get('FTS_ENABLED'):
+        print("Full-text search index is not available for this database.")
+        return
+    rebuild_search_index()
+    print(f"Rebuilt search index for {Product.query.count()} products.")
+
+@app.cli.command('rebuild-facets')
+def rebuild_facets_command():
+    """Recount the facet summary from the product table."""
+    with db.engine.begin() as conn:
+        rebuild_facet_summary(conn)
+    print(f"Rebuilt facet counts for {Product.query.count()} products.")
+
+@app.cli.command('rebuild-dimension-index')
+def rebuild_dimension_index_command():
+    """Rebuild the rubber dimension R*Tree from the product table."""
+    if not app.config.get('DIMENSIONS_ENABLED'):
+        print("Dimension index is not available for this database.")
+        return
+    with db.engine.begin() as conn:
+        rebuild_dimension_index(conn)
+    print(f"Rebuilt dimension index for {Product.query.count()} products.")
 
 # Helper function to check allowed file extensions
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
 
+# Content-addressed upload store: files are named by the SHA-256 of their bytes
+CONTENT_ADDRESSED_RE = re.compile(r'^[0-9a-f]{64}\.[a-z0-9]+$')
+
+class ContentAddressedStore:
+    def __init__(self, folder, chunk_size):
+        self.folder = folder
+        self.chunk_size = chunk_size
+
+    def save(self, file_storage):
+        # Hash while streaming to a temp file, then move it into place unless the digest already exists
+        extension = file_storage.filename.rsplit('.', 1)[1].lower()
+        extension = 'jpg' if extension == 'jpeg' else extension
+        hasher = hashlib.sha256()
+        started = time.perf_counter()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.folder, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                for chunk in iter(lambda: file_storage.stream.read(self.chunk_size), b''):
+                    hasher.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+            filename = f"{hasher.hexdigest()}.{extension}"
+            path = os.path.join(self.folder, filename)
+            if os.path.exists(path):
+                os.remove(tmp_path)
+                os.utime(path)  # tells a pending orphan cleanup the file is in use again
+                outcome = 'deduplicated'
+            else:
+                os.replace(tmp_path, path)
+                outcome = 'stored'
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        metrics.inc('uploads_total', outcome=outcome)
+        metrics.inc('upload_bytes_total', size)
+        metrics.inc('upload_seconds_total', time.perf_counter() - started)
+        return filename
+
+upload_store = ContentAddressedStore(app.config['UPLOAD_FOLDER'], app.config['UPLOAD_CHUNK_SIZE'])
+
+# Image renditions (thumbnail/medium, JPEG + WebP), rendered in a process pool
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg'}
+class RenditionPools:
+    # A process pool that renders, and one thread that stores the results off the pool's management
+    # thread, which must not wait on the database. ProcessPoolExecutor makes its call and result queues
+    # in __init__, so like the write queue's thread the pools are created per worker process: a worker
+    # forked from a preloaded master would otherwise share them with its siblings.
+    def __init__(self, workers):
+        self.workers = workers
+        self.render = None
+        self.store = None
+        self.pid = None
+        self.lock = threading.Lock()
+
+    def get(self):
+        with self.lock:
+            if self.render is None or self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.render = ProcessPoolExecutor(max_workers=self.workers)
+                self.store = ThreadPoolExecutor(max_workers=1, thread_name_prefix='rendition-store')
+            return self.render, self.store
+
+    def shutdown(self):
+        # Let queued renders finish and store their results before exiting
+        with self.lock:
+            if self.render is not None and self.pid == os.getpid():
+                self.render.shutdown(wait=True)
+                self.store.shutdown(wait=True)
+
+rendition_pools = RenditionPools(app.config['RENDITION_WORKERS'])
+atexit.register(rendition_pools.shutdown)
+
+def render_renditions(paths, dest_folder, sizes, quality):
+    # Runs in a worker process; returns {path: {size: {jpeg, webp, width}} or None}
+    results = {}
+    for path in paths:
+        try:
+            stem = os.path.splitext(os.path.basename(path))[0]
+            renditions = {}
+            with Image.open(path) as original:
+                image = ImageOps.exif_transpose(original).convert('RGB')
+            for name, width in sizes.items():
+                resized = image.copy()
+                resized.thumbnail((width, width * 2), Image.LANCZOS)
+                jpeg_path = f"{dest_folder}/{stem}_{name}.jpg"
+                webp_path = f"{dest_folder}/{stem}_{name}.webp"
+                resized.save(jpeg_path, 'JPEG', quality=quality, optimize=True, progressive=True)
+                resized.save(webp_path, 'WEBP', quality=quality, method=4)
+                renditions[name] = {"jpeg": jpeg_path, "webp": webp_path, "width": resized.width}
+            results[path] = renditions
+        except Exception:
+            results[path] = None
+    return results
+
+def renderable_images(urls):
+    prefix = app.config['UPLOAD_FOLDER'] + '/'
+    return [url for url in urls if url.startswith(prefix) and url.rsplit('.', 1)[-1].lower() in IMAGE_EXTENSIONS
+            and os.path.isfile(url)]
+
+def store_renditions(product_id, results):
+    for url, r in results.items():
+        if r is None:
+            app.logger.error("Error rendering image %s", url)
+
+    def write():
+        product = db.session.get(Product, product_id)
+        if product is None:
+            return
+        for image in product.images:
+            if results.get(image.url):
+                image.renditions = json.dumps(results[image.url])
+        product.updated_at = datetime.utcnow()
+
+    with app.app_context():
+        run_write(write)
+        invalidate_product_cache()
+
+def store_rendered(product_id, future):
+    try:
+        store_renditions(product_id, future.result())
+    except Exception as e:
+        app.logger.error("Error storing renditions for product %s: %s", product_id, e)
+
+def schedule_renditions(product_id, urls):
+    paths = renderable_images(urls)
+    if not paths or Image is None:
+        return
+    render_pool, store_pool = rendition_pools.get()
+    future = render_pool.submit(render_renditions, paths, app.config['RENDITIONS_FOLDER'],
+                                app.config['RENDITION_SIZES'], app.config['RENDITION_QUALITY'])
+    future.add_done_callback(lambda f: store_pool.submit(store_rendered, product_id, f))
+
+@app.template_filter('upload_url')
+def upload_url(path):
+    prefix = app.config['UPLOAD_FOLDER'] + '/'
+    filename = path[len(prefix):] if path.startswith(prefix) else path.split('/')[-1]
+    return url_for('serve_uploaded_file', filename=filename)
+
+@app.template_filter('srcset')
+def srcset(renditions, fmt):
+    return ", ".join(f"{upload_url(r[fmt])} {r['width']}w" for r in renditions.values())
+
+# Map an API payload onto Product attributes
+WRITABLE_FIELDS = [f for f in PRODUCT_FIELDS if f not in ('id', 'stock_reserved', 'product_image_renditions', 'updated_at',
+                                                           'change_version')]
+LIST_FIELDS = {'download_pdfs': 'pdf_urls', 'product_image_urls': 'image_urls', 'youtube_links': 'video_links', 'variants': 'variant_data'}
+FIELD_DEFAULTS = {'in_stock': True, 'stock_number': 0, 'is_rubber': False}
+
+def product_values(data, partial=False):
+    # Returns Product attribute values; with partial=True only for the fields present in data
+    values = {}
+    for field in WRITABLE_FIELDS:
+        if partial and field not in data:
+            continue
+        value = data.get(field, FIELD_DEFAULTS.get(field))
+        if field == 'variants':
+            value = parse_variants(value)
+        elif field in LIST_FIELDS:
+            value = split_list(value)
+        values[LIST_FIELDS.get(field, field)] = value
+    return values
+
+# CSV cells arrive as strings; NDJSON values pass through unchanged
+FLOAT_FIELDS = {'mrp', 'offer_price', 'rubber_density', 'rubber_height', 'rubber_length', 'rubber_thickness'}
+INT_FIELDS = {'stock_number'}
+BOOL_FIELDS = {'in_stock', 'is_rubber'}
+
+def coerce_row(row):
+    data = {}
+    for key, value in row.items():
+        if key not in WRITABLE_FIELDS:
+            continue
+        if isinstance(value, str):
+            value = value.strip()
+            if key in FLOAT_FIELDS:
+                value = float(value) if value else None
+            elif key in INT_FIELDS:
+                value = int(value) if value else 0
+            elif key in BOOL_FIELDS:
+                value = value.lower() in ('1', 'true', 'yes', 'on')
+        data[key] = value
+    sku = data.get('sku')
+    # Chunks are keyed by sku and matched against the strings the database returns
+    if isinstance(sku, int) and not isinstance(sku, bool):
+        data['sku'] = sku = str(sku)
+    if not sku:
+        raise ValueError("Missing sku")
+    if not isinstance(sku, str):
+        raise ValueError("sku must be a string")
+    return data
+
 # Login required decorator
 def login_required(f):
     def wrap(*args, **kwargs):
@@ -112,9 +1678,8 @@ def register():
         password = request.form.get('password')
         if User.query.filter_by(username=username).first():
             return render_template('register.html', error="Username already exists")
-        user = User(username=username, password_hash=generate_password_hash(password))
-        db.session.add(user)
-        db.session.commit()
+        password_hash = generate_password_hash(password)
+        run_write(lambda: db.session.add(User(username=username, password_hash=password_hash)))
         return redirect(url_for('login'))
     return render_template('register.html')
 
@@ -135,45 +1700,120 @@ def logout():
     session.pop('user_id', None)
     return redirect(url_for('login'))
 
+# Response compression: dynamic HTML/JSON is compressed per response, static files use variants
+# written ahead of time by the precompress-static command
+PRECOMPRESSED_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+def accepted_encodings():
+    # Supported encodings the client accepts, best first
+    offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+    accepted = request.accept_encodings
+    return sorted((coding for coding in offered if accepted[coding]), key=lambda coding: -accepted[coding])
+
+def compress_body(data, coding, level=None):
+    if coding == 'br':
+        return brotli.compress(data, quality=level if level is not None else app.config['COMPRESS_BROTLI_QUALITY'])
+    compressor = zlib.compressobj(level if level is not None else app.config['COMPRESS_LEVEL'], zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+@app.after_request
+def compress_response(response):
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers or response.mimetype not in app.config['COMPRESS_MIMETYPES']):
+        return response
+    data = response.get_data()
+    if len(data) < app.config['COMPRESS_MIN_SIZE']:
+        return response
+    response.vary.add('Accept-Encoding')
+    codings = accepted_encodings()
+    if not codings:
+        return response
+    coding = codings[0]
+    etag, weak = response.get_etag()
+    # Identical bodies share one ETag, so a cached response is compressed once, not on every hit
+    cache_key = (etag, coding) if etag and not weak else None
+    body = compressed_cache.get(cache_key) if cache_key else None
+    if body is None:
+        body = compress_body(data, coding)
+        if cache_key:
+            compressed_cache.set(cache_key, body)
+    if len(body) >= len(data):
+        return response
+    if cache_key:
+        # The encoded bytes differ from the identity ones; a weak ETag still matches If-None-Match
+        response.set_etag(etag, weak=True)
+    response.set_data(body)
+    response.headers['Content-Encoding'] = coding
+    return response
+
+def send_precompressed(directory, filename, **kwargs):
+    # Prefer a .br/.gz sibling the client accepts, as long as it isn't older than the file itself
+    path = safe_join(directory, filename)
+    if path is None or not os.path.isfile(path):
+        return send_from_directory(directory, filename, **kwargs)
+    variants = [(coding, path + suffix) for coding, suffix in PRECOMPRESSED_SUFFIXES.items()
+                if os.path.isfile(path + suffix) and os.path.getmtime(path + suffix) >= os.path.getmtime(path)]
+    if not variants:
+        return send_from_directory(directory, filename, **kwargs)
+    available = dict(variants)
+    coding = next((coding for coding in accepted_encodings() if coding in available), None)
+    if coding is None:
+        response = send_from_directory(directory, filename, **kwargs)
+    else:
+        if isinstance(kwargs.get('etag'), str):
+            kwargs['etag'] = f"{kwargs['etag']}-{coding}"
+        response = send_from_directory(directory, filename + PRECOMPRESSED_SUFFIXES[coding],
+                                       mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream', **kwargs)
+        response.headers['Content-Encoding'] = coding
+    response.vary.add('Accept-Encoding')
+    return response
+
 # Serve static files explicitly (for debugging)
 @app.route('/static/uploads/<path:filename>')
 def serve_uploaded_file(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    if CONTENT_ADDRESSED_RE.match(filename):
+        # The name is the content hash, so the bytes behind it can be cached forever
+        max_age = app.config['UPLOAD_CACHE_MAX_AGE']
+        response = send_precompressed(app.config['UPLOAD_FOLDER'], filename, etag=filename.split('.')[0], max_age=max_age)
+        response.headers['Cache-Control'] = f'public, max-age={max_age}, immutable'
+        return response
+    return send_precompressed(app.config['UPLOAD_FOLDER'], filename)
 
 # UI Routes
+def render_cards(products):
+    # products only need id and change_version; just the ones without a cached card are loaded in full
+    cards = {product.id: card_cache.get((product.id, product.change_version)) for product in products}
+    missing = [product_id for product_id, card in cards.items() if card is None]
+    if missing:
+        stale = with_children(Product.query.filter(Product.id.in_(missing))).execution_options(populate_existing=True)
+        for product in stale:
+            card = cards[product.id] = Markup(render_template('product_card.html', product=product))
+            card_cache.set((product.id, product.change_version), card)
+    # A product deleted since the page query has no card
+    return [cards[product.id] for product in products if cards[product.id] is not None]
+
 @app.route('/')
 @login_required
 def index():
     page = request.args.get('page', 1, type=int)
     per_page = 10
-    query = request.args.get('q', '').lower()
-    category = request.args.get('category', '')
-    in_stock = request.args.get('in_stock', '')
-    min_price = request.args.get('min_price', type=float)
-    max_price = request.args.get('max_price', type=float)
 
-    # Build query with filters
-    product_query = Product.query
-    if query:
-        product_query = product_query.filter(
-            Product.product_name.ilike(f'%{query}%') |
-            Product.category.ilike(f'%{query}%') |
-            Product.short_description.ilike(f'%{query}%') |
-            Product.long_description.ilike(f'%{query}%') |
-            Product.rubber_description.ilike(f'%{query}%')
-        )
-    if category:
-        product_query = product_query.filter(Product.category == category)
-    if in_stock:
-        product_query = product_query.filter(Product.in_stock == (in_stock == 'true'))
-    if min_price is not None:
-        product_query = product_query.filter(Product.offer_price >= min_price)
-    if max_price is not None:
-        product_query = product_query.filter(Product.offer_price <= max_price)
+    # Build query with filters; with only id and change_version selected SQLite may read a covering
+    # index instead of the table, so fix the order the full-row listing used to get implicitly.
+    # A ranked q= search is already ordered by bm25 with id as its tiebreaker
+    product_query = filter_products(request.args)
+    if not ranked_search(request.args.get('q', '')):
+        product_query = product_query.order_by(Product.id)
+    products_pagination = paginate_products(product_query, request.args, page, per_page, fields=['id', 'change_version'])
+    facets = compute_facets(request.args)
+    filter_args = {k: v for k, v in request.args.items() if k != 'page'}
+    return render_template('index.html', cards=render_cards(products_pagination.items), pagination=products_pagination,
+                           categories=facets["categories"], facets=facets, dimensions=DIMENSIONS,
+                           filter_args=filter_args)
 
-    products_pagination = product_query.paginate(page=page, per_page=per_page, error_out=False)
-    categories = [p.category for p in Product.query.distinct(Product.category)]
-    return render_template('index.html', products=products_pagination.items, pagination=products_pagination, categories=categories)
+@app.route('/facets', methods=['GET'])
+def get_facets():
+    return cached_json_response(lambda: (compute_facets(request.args), []))
 
 @app.route('/add', methods=['GET', 'POST'])
 @login_required
@@ -184,44 +1824,46 @@ def add_product_ui():
         pdfs = request.files.getlist('pdfs')
         image_order = data.get('image_order', '').split(',') if data.get('image_order') else []
 
-        app.logger.debug(f"Received form data: {data}")
-        app.logger.debug(f"Received images: {[f.filename for f in images]}")
-        app.logger.debug(f"Received image order: {image_order}")
+        debug_sampled("Received form fields: %s", lambda: sorted(data.keys()))
+        debug_sampled("Received images: %s", lambda: [f.filename for f in images])
+        debug_sampled("Received image order: %s", image_order)
 
         image_urls = []
+        image_names = {}  # stored url -> uploaded filename, for image_order
         for image in images:
             if image and allowed_file(image.filename):
                 filename = secure_filename(image.filename)
-                image_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
                 try:
-                    image.save(image_path)
-                    image_urls.append(f"{app.config['UPLOAD_FOLDER']}/{filename}")
-                    app.logger.debug(f"Saved image: {image_path}")
+                    stored_name = upload_store.save(image)
+                    image_path = os.path.join(app.config['UPLOAD_FOLDER'], stored_name)
+                    image_urls.append(f"{app.config['UPLOAD_FOLDER']}/{stored_name}")
+                    image_names[image_urls[-1]] = filename
+                    debug_sampled("Saved image: %s", image_path)
                 except Exception as e:
-                    app.logger.error(f"Error saving image {filename}: {str(e)}")
+                    app.logger.error("Error saving image %s: %s", filename, e)
 
         # Reorder images based on image_order
         ordered_urls = []
         for filename in image_order:
             for url in image_urls[:]:
-                if filename in url:
+                if image_names.get(url) in (filename, secure_filename(filename)):
                     ordered_urls.append(url)
                     image_urls.remove(url)
                     break
         image_urls = ordered_urls + image_urls
-        app.logger.debug(f"Final image URLs: {image_urls}")
+        debug_sampled("Final image URLs: %s", image_urls)
 
         pdf_urls = []
         for pdf in pdfs:
             if pdf and allowed_file(pdf.filename):
                 filename = secure_filename(pdf.filename)
-                pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
                 try:
-                    pdf.save(pdf_path)
-                    pdf_urls.append(f"{app.config['UPLOAD_FOLDER']}/{filename}")
-                    app.logger.debug(f"Saved PDF: {pdf_path}")
+                    stored_name = upload_store.save(pdf)
+                    pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], stored_name)
+                    pdf_urls.append(f"{app.config['UPLOAD_FOLDER']}/{stored_name}")
+                    debug_sampled("Saved PDF: %s", pdf_path)
                 except Exception as e:
-                    app.logger.error(f"Error saving PDF {filename}: {str(e)}")
+                    app.logger.error("Error saving PDF %s: %s", filename, e)
 
         # Handle multiple variants
         variants = []
@@ -233,11 +1875,11 @@ def add_product_ui():
                 try:
                     variants.append({"name": name, "price": float(price), "sku": sku})
                 except ValueError:
-                    app.logger.error(f"Invalid variant price: {price}")
-        app.logger.debug(f"Variants: {variants}")
+                    app.logger.error("Invalid variant price: %s", price)
+        debug_sampled("Variants: %s", variants)
 
 
-        product = Product(
+        values = dict(
             category=data.get('category'),
             product_name=data.get('product_name'),
             short_description=data.get('short_description'),
@@ -247,9 +1889,9 @@ def add_product_ui():
             sku=data.get('sku'),
             in_stock=data.get('in_stock') == 'on',
             stock_number=int(data.get('stock_number')) if data.get('stock_number') else 0,
-            download_pdfs=",".join(pdf_urls),
-            product_image_urls=",".join(image_urls),
-            youtube_links=data.get('youtube_links'),
+            pdf_urls=pdf_urls,
+            image_urls=image_urls,
+            video_links=split_list(data.get('youtube_links')),
             technical_information=data.get('technical_information'),
             manufacturer=data.get('manufacturer'),
             special_note=data.get('special_note'),
@@ -260,11 +1902,19 @@ def add_product_ui():
             rubber_length=float(data.get('rubber_length')) if data.get('rubber_length') else None,
             rubber_thickness=float(data.get('rubber_thickness')) if data.get('rubber_thickness') else None,
             rubber_description=data.get('rubber_description'),
-            variants=json.dumps(variants) if variants else None
+            variant_data=variants
         )
-        db.session.add(product)
-        db.session.commit()
-        app.logger.debug(f"Added product: {product.product_name}, Image URLs: {product.product_image_urls}")
+
+        def write():
+            product = Product(**values)
+            db.session.add(product)
+            db.session.flush()
+            return product.id
+
+        product_id = run_write(write)
+        invalidate_product_cache()
+        schedule_renditions(product_id, image_urls)
+        app.logger.debug("Added product: %s, Image URLs: %s", values['product_name'], image_urls)
         return redirect(url_for('index'))
     
     return render_template('add_product.html')
@@ -279,44 +1929,48 @@ def edit_product_ui(product_id):
         pdfs = request.files.getlist('pdfs')
         image_order = data.get('image_order', '').split(',') if data.get('image_order') else []
 
-        app.logger.debug(f"Received form data: {data}")
-        app.logger.debug(f"Received images: {[f.filename for f in images]}")
-        app.logger.debug(f"Received image order: {image_order}")
+        debug_sampled("Received form fields: %s", lambda: sorted(data.keys()))
+        debug_sampled("Received images: %s", lambda: [f.filename for f in images])
+        debug_sampled("Received image order: %s", image_order)
 
-        image_urls = product.product_image_urls.split(",") if product.product_image_urls else []
+        image_urls = product.image_urls
+        new_image_urls = []
+        image_names = {url: url.split('/')[-1] for url in image_urls}
         for image in images:
             if image and allowed_file(image.filename):
                 filename = secure_filename(image.filename)
-                image_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
                 try:
-                    image.save(image_path)
-                    image_urls.append(f"{app.config['UPLOAD_FOLDER']}/{filename}")
-                    app.logger.debug(f"Saved image: {image_path}")
+                    stored_name = upload_store.save(image)
+                    image_path = os.path.join(app.config['UPLOAD_FOLDER'], stored_name)
+                    image_urls.append(f"{app.config['UPLOAD_FOLDER']}/{stored_name}")
+                    image_names[image_urls[-1]] = filename
+                    new_image_urls.append(image_urls[-1])
+                    debug_sampled("Saved image: %s", image_path)
                 except Exception as e:
-                    app.logger.error(f"Error saving image {filename}: {str(e)}")
+                    app.logger.error("Error saving image %s: %s", filename, e)
 
         # Reorder images based on image_order
         ordered_urls = []
         for filename in image_order:
             for url in image_urls[:]:
-                if filename in url:
+                if image_names.get(url) in (filename, secure_filename(filename)):
                     ordered_urls.append(url)
                     image_urls.remove(url)
                     break
         image_urls = ordered_urls + image_urls
-        app.logger.debug(f"Final image URLs: {image_urls}")
+        debug_sampled("Final image URLs: %s", image_urls)
 
-        pdf_urls = product.download_pdfs.split(",") if product.download_pdfs else []
+        pdf_urls = product.pdf_urls
         for pdf in pdfs:
             if pdf and allowed_file(pdf.filename):
                 filename = secure_filename(pdf.filename)
-                pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
                 try:
-                    pdf.save(pdf_path)
-                    pdf_urls.append(f"{app.config['UPLOAD_FOLDER']}/{filename}")
-                    app.logger.debug(f"Saved PDF: {pdf_path}")
+                    stored_name = upload_store.save(pdf)
+                    pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], stored_name)
+                    pdf_urls.append(f"{app.config['UPLOAD_FOLDER']}/{stored_name}")
+                    debug_sampled("Saved PDF: %s", pdf_path)
                 except Exception as e:
-                    app.logger.error(f"Error saving PDF {filename}: {str(e)}")
+                    app.logger.error("Error saving PDF %s: %s", filename, e)
 
         # Handle multiple variants
         variants = []
@@ -328,35 +1982,46 @@ def edit_product_ui(product_id):
                 try:
                     variants.append({"name": name, "price": float(price), "sku": sku})
                 except ValueError:
-                    app.logger.error(f"Invalid variant price: {price}")
-        app.logger.debug(f"Variants: {variants}")
+                    app.logger.error("Invalid variant price: %s", price)
+        debug_sampled("Variants: %s", variants)
 
 
-        product.category = data.get('category', product.category)
-        product.product_name = data.get('product_name', product.product_name)
-        product.short_description = data.get('short_description', product.short_description)
-        product.long_description = data.get('long_description', product.long_description)
-        product.mrp = float(data.get('mrp', product.mrp)) if data.get('mrp') else product.mrp
-        product.offer_price = float(data.get('offer_price', product.offer_price)) if data.get('offer_price') else product.offer_price
-        product.sku = data.get('sku', product.sku)
-        product.in_stock = data.get('in_stock') == 'on'
-        product.stock_number = int(data.get('stock_number', product.stock_number)) if data.get('stock_number') else product.stock_number
-        product.download_pdfs = ",".join(pdf_urls)
-        product.product_image_urls = ",".join(image_urls)
-        product.youtube_links = data.get('youtube_links', product.youtube_links)
-        product.technical_information = data.get('technical_information', product.technical_information)
-        product.manufacturer = data.get('manufacturer', product.manufacturer)
-        product.special_note = data.get('special_note', product.special_note)
-        product.whatsapp_number = data.get('whatsapp_number', product.whatsapp_number)
-        product.is_rubber = data.get('is_rubber') == 'on'
-        product.rubber_density = float(data.get('rubber_density')) if data.get('rubber_density') else None
-        product.rubber_height = float(data.get('rubber_height')) if data.get('rubber_height') else None
-        product.rubber_length = float(data.get('rubber_length')) if data.get('rubber_length') else None
-        product.rubber_thickness = float(data.get('rubber_thickness')) if data.get('rubber_thickness') else None
-        product.rubber_description = data.get('rubber_description', product.rubber_description)
-        product.variants = json.dumps(variants) if variants else product.variants
-        db.session.commit()
-        app.logger.debug(f"Updated product: {product.product_name}, Image URLs: {product.product_image_urls}")
+        def write():
+            product = Product.query.get_or_404(product_id)
+            product.category = data.get('category', product.category)
+            product.product_name = data.get('product_name', product.product_name)
+            product.short_description = data.get('short_description', product.short_description)
+            product.long_description = data.get('long_description', product.long_description)
+            product.mrp = float(data.get('mrp', product.mrp)) if data.get('mrp') else product.mrp
+            product.offer_price = float(data.get('offer_price', product.offer_price)) if data.get('offer_price') else product.offer_price
+            product.sku = data.get('sku', product.sku)
+            product.in_stock = data.get('in_stock') == 'on'
+            product.stock_number = int(data.get('stock_number', product.stock_number)) if data.get('stock_number') else product.stock_number
+            product.pdf_urls = pdf_urls
+            product.image_urls = image_urls
+            if 'youtube_links' in data:
+                product.video_links = split_list(data.get('youtube_links'))
+            product.technical_information = data.get('technical_information', product.technical_information)
+            product.manufacturer = data.get('manufacturer', product.manufacturer)
+            product.special_note = data.get('special_note', product.special_note)
+            product.whatsapp_number = data.get('whatsapp_number', product.whatsapp_number)
+            product.is_rubber = data.get('is_rubber') == 'on'
+            product.rubber_density = float(data.get('rubber_density')) if data.get('rubber_density') else None
+            product.rubber_height = float(data.get('rubber_height')) if data.get('rubber_height') else None
+            product.rubber_length = float(data.get('rubber_length')) if data.get('rubber_length') else None
+            product.rubber_thickness = float(data.get('rubber_thickness')) if data.get('rubber_thickness') else None
+            product.rubber_description = data.get('rubber_description', product.rubber_description)
+            if variants:
+                product.variant_data = variants
+            check_stock_numbers([product_id])
+
+        try:
+            run_write(write)
+        except StockError as e:
+            return render_template('edit_product.html', product=product, error=str(e)), 409
+        invalidate_product_cache()
+        schedule_renditions(product_id, new_image_urls)
+        app.logger.debug("Updated product: %s, Image URLs: %s", data.get('product_name'), image_urls)
         return redirect(url_for('index'))
     
     return render_template('edit_product.html', product=product)
@@ -364,135 +2029,755 @@ def edit_product_ui(product_id):
 @app.route('/delete/<int:product_id>', methods=['POST'])
 @login_required
 def delete_product_ui(product_id):
-    product = Product.query.get_or_404(product_id)
-    db.session.delete(product)
-    db.session.commit()
-    app.logger.debug(f"Deleted product ID: {product_id}")
+    if not batch_delete([product_id]):
+        abort(404)
+    app.logger.debug("Deleted product ID: %s", product_id)
     return redirect(url_for('index'))
 
 @app.route('/delete-selected', methods=['POST'])
 @login_required
 def delete_selected():
-    product_ids = request.form.getlist('product_ids[]')
-    for product_id in product_ids:
-        product = Product.query.get(product_id)
-        if product:
-            db.session.delete(product)
-    db.session.commit()
-    app.logger.debug(f"Deleted products: {product_ids}")
+    product_ids = request.form.getlist('product_ids[]', type=int)
+    if product_ids:
+        batch_delete(product_ids)
+    app.logger.debug("Deleted products: %s", product_ids)
     return redirect(url_for('index'))
 
 # Existing API Routes
 @app.route('/add-product', methods=['POST'])
 def add_product():
     data = request.get_json()
-    variants = data.get('variants', [])
-    product = Product(
-        category=data.get('category'),
-        product_name=data.get('product_name'),
-        short_description=data.get('short_description'),
-        long_description=data.get('long_description'),
-        mrp=data.get('mrp'),
-        offer_price=data.get('offer_price'),
-        sku=data.get('sku'),
-        in_stock=data.get('in_stock', True),
-        stock_number=data.get('stock_number', 0),
-        download_pdfs=",".join(data.get('download_pdfs', [])),
-        product_image_urls=",".join(data.get('product_image_urls', [])),
-        youtube_links=data.get('youtube_links'),
-        technical_information=data.get('technical_information'),
-        manufacturer=data.get('manufacturer'),
-        special_note=data.get('special_note'),
-        whatsapp_number=data.get('whatsapp_number'),
-        is_rubber=data.get('is_rubber', False),
-        rubber_density=data.get('rubber_density'),
-        rubber_height=data.get('rubber_height'),
-        rubber_length=data.get('rubber_length'),
-        rubber_thickness=data.get('rubber_thickness'),
-        rubber_description=data.get('rubber_description'),
-        variants=json.dumps(variants) if variants else None
-    )
-    db.session.add(product)
-    db.session.commit()
-    app.logger.debug(f"API: Added product: {product.product_name}")
-    return jsonify({"message": "Product added", "product_id": product.id}), 201
+    try:
+        values = product_values(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def write():
+        product = Product(**values)
+        db.session.add(product)
+        db.session.flush()
+        return product.id
+
+    product_id = run_write(write)
+    invalidate_product_cache()
+    app.logger.debug("API: Added product: %s", data.get('product_name'))
+    return jsonify({"message": "Product added", "product_id": product_id}), 201
+
+UNDECODABLE_RE = re.compile('[\udc80-\udcff]')  # bytes that weren't valid UTF-8, kept by surrogateescape
+
+def read_bulk_rows(stream, fmt):
+    # Yields (line_number, row_or_exception) without ever holding more than one line.
+    # Lines are decoded one at a time so a bad byte fails only the row it is in.
+    lines = (raw.decode('utf-8', errors='surrogateescape') for raw in io.BufferedReader(stream))
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            if any(isinstance(value, str) and UNDECODABLE_RE.search(value) for value in row.values()):
+                yield reader.line_num, ValueError("Invalid UTF-8")
+            else:
+                yield reader.line_num, row
+        return
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            if UNDECODABLE_RE.search(line):
+                raise ValueError("Invalid UTF-8")
+            row = json.loads(line)
+            if not isinstance(row, dict):
+                raise ValueError("Expected a JSON object")
+            yield line_number, row
+        except ValueError as e:
+            yield line_number, e
+
+CHILD_MODELS = {'variant_data': ProductVariant, 'image_urls': ProductImage, 'pdf_urls': ProductPdf, 'video_links': ProductVideo}
+
+def child_rows(key, product_id, items):
+    if key == 'variant_data':
+        return [{"product_id": product_id, "position": i, "name": v.get('name'), "price": v.get('price'), "sku": v.get('sku')}
+                for i, v in enumerate(items)]
+    return [{"product_id": product_id, "position": i, "url": url} for i, url in enumerate(items)]
+
+def replace_children(children):
+    # children maps product_id -> {list field: items}; every supplied field replaces that
+    # product's rows, one DELETE and one INSERT per child table
+    for key, model in CHILD_MODELS.items():
+        owners = [product_id for product_id, values in children.items() if key in values]
+        if not owners:
+            continue
+        db.session.execute(model.__table__.delete().where(model.product_id.in_(owners)))
+        rows = [row for product_id, values in children.items() if key in values
+                for row in child_rows(key, product_id, values[key])]
+        if rows:
+            db.session.execute(model.__table__.insert(), rows)
+
+def upsert_chunk(chunk):
+    # chunk maps sku -> (line_number, coerced_row); a later line for the same sku replaces the earlier one
+    existing = dict(db.session.query(Product.sku, Product.id).filter(Product.sku.in_(list(chunk))).all())
+    inserts, updates, children = [], [], {}
+    for sku, (line_number, data) in chunk.items():
+        values = product_values(data, partial=sku in existing)
+        columns = {k: v for k, v in values.items() if k not in CHILD_MODELS}
+        children[sku] = {k: v for k, v in values.items() if k in CHILD_MODELS}
+        if sku in existing:
+            updates.append({"id": existing[sku], **columns})
+        else:
+            inserts.append(columns)
+    # One sequence bump for the chunk instead of one per row
+    first_version = reserve_versions(db.session.connection(), len(chunk))
+    for version, row in enumerate(inserts + updates, start=first_version):
+        row["change_version"] = version
+    if inserts:
+        inserted = db.session.execute(insert(Product).returning(Product.id, Product.sku), inserts)
+        existing.update({sku: product_id for product_id, sku in inserted})
+    if updates:
+        db.session.execute(update(Product), updates)
+        check_stock_numbers([row["id"] for row in updates if "stock_number" in row])
+    replace_children({existing[sku]: values for sku, values in children.items()})
+    return len(inserts), len(updates)
+
+@app.route('/products/bulk', methods=['POST'])
+def bulk_upsert_products():
+    fmt = request.args.get('format') or ('csv' if request.mimetype == 'text/csv' else 'ndjson')
+    chunk_size = app.config['BULK_CHUNK_SIZE']
+    max_errors = app.config['BULK_MAX_ERRORS']
+    stream = get_input_stream(request.environ, max_content_length=app.config['BULK_MAX_CONTENT_LENGTH'])
+    result = {"inserted": 0, "updated": 0, "failed": 0, "errors": [], "errors_truncated": False}
+
+    def record_error(line_number, sku, error):
+        result["failed"] += 1
+        if len(result["errors"]) < max_errors:
+            result["errors"].append({"line": line_number, "sku": sku, "error": error})
+        else:
+            result["errors_truncated"] = True
+
+    def upsert_rows(chunk):
+        # Fallback for a failed chunk: a savepoint per row, all committed together by run_write
+        inserted = updated = 0
+        errors = []
+        for sku, entry in chunk.items():
+            try:
+                with db.session.begin_nested():
+                    row_inserted, row_updated = upsert_chunk({sku: entry})
+                inserted += row_inserted
+                updated += row_updated
+            except StockError as row_error:
+                errors.append((entry[0], sku, str(row_error)))
+            except SQLAlchemyError as row_error:
+                errors.append((entry[0], sku, str(row_error.orig if hasattr(row_error, 'orig') else row_error)))
+        return inserted, updated, errors
+
+    def flush(chunk):
+        if not chunk:
+            return
+        try:
+            inserted, updated = run_write(lambda: upsert_chunk(chunk))
+        except (SQLAlchemyError, StockError) as e:
+            app.logger.warning("Bulk chunk failed, retrying row by row: %s", e)
+            inserted, updated, errors = run_write(lambda: upsert_rows(chunk))
+            for error in errors:
+                record_error(*error)
+        result["inserted"] += inserted
+        result["updated"] += updated
+        invalidate_product_cache()
+
+    chunk = {}
+    for line_number, row in read_bulk_rows(stream, fmt):
+        if isinstance(row, Exception):
+            record_error(line_number, None, str(row))
+            continue
+        try:
+            data = coerce_row(row)
+            product_values(data)
+        except (ValueError, TypeError) as e:
+            record_error(line_number, row.get('sku'), str(e))
+            continue
+        chunk[data['sku']] = (line_number, data)
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            chunk = {}
+    flush(chunk)
+    app.logger.debug("API: Bulk upsert inserted %s, updated %s, failed %s", result['inserted'], result['updated'], result['failed'])
+    return jsonify(result), 200
+
+# Batch endpoints: one set-based statement per table for the whole id list, in one transaction
+def batch_ids(value):
+    if not isinstance(value, list) or not value:
+        raise ValueError("Expected a non-empty list of ids")
+    if not all(isinstance(i, int) and not isinstance(i, bool) for i in value):
+        raise ValueError("Ids must be integers")
+    ids = list(dict.fromkeys(value))
+    if len(ids) > app.config['BATCH_MAX_IDS']:
+        raise ValueError(f"At most {app.config['BATCH_MAX_IDS']} ids per request")
+    return ids
+
+def delete_products(product_ids):
+    # Returns the deleted ids and the upload files they referenced, as {path: source image/pdf url}
+    files = {}
+    for url, renditions in db.session.query(ProductImage.url, ProductImage.renditions).filter(ProductImage.product_id.in_(product_ids)):
+        files[url] = url
+        for rendition in json.loads(renditions or '{}').values():
+            files.update({rendition[fmt]: url for fmt in ('jpeg', 'webp') if rendition.get(fmt)})
+    for (url,) in db.session.query(ProductPdf.url).filter(ProductPdf.product_id.in_(product_ids)):
+        files[url] = url
+    for model in CHILD_MODELS.values():
+        db.session.execute(model.__table__.delete().where(model.product_id.in_(product_ids)))
+    product_table = Product.__table__
+    deleted = db.session.execute(product_table.delete().where(product_table.c.id.in_(product_ids))
+                                 .returning(product_table.c.id, product_table.c.sku)).all()
+    if deleted:
+        first_version = reserve_versions(db.session.connection(), len(deleted))
+        db.session.execute(ProductTombstone.__table__.insert(), [
+            {"product_id": product_id, "sku": sku, "change_version": version, "deleted_at": datetime.utcnow()}
+            for version, (product_id, sku) in enumerate(deleted, start=first_version)
+        ])
+    return [product_id for product_id, _ in deleted], files
+
+def update_products(changes):
+    # changes maps product_id -> product_values(partial=True); returns the ids that exist and were updated
+    found = {product_id for (product_id,) in db.session.query(Product.id).filter(Product.id.in_(list(changes)))}
+    now = datetime.utcnow()
+    rows = [{"id": product_id, "updated_at": now, **{k: v for k, v in values.items() if k not in CHILD_MODELS}}
+            for product_id, values in changes.items() if product_id in found]
+    if rows:
+        first_version = reserve_versions(db.session.connection(), len(rows))
+        for version, row in enumerate(rows, start=first_version):
+            row["change_version"] = version
+        db.session.execute(update(Product), rows)
+        check_stock_numbers([row["id"] for row in rows if "stock_number" in row])
+    replace_children({product_id: {k: v for k, v in values.items() if k in CHILD_MODELS}
+                      for product_id, values in changes.items() if product_id in found})
+    return [product_id for product_id in changes if product_id in found]
+
+# Upload files left unreferenced by a delete are removed in the background
+cleanup_pool = None
+cleanup_lock = threading.Lock()
+
+def remove_orphaned_uploads(files, deleted_at):
+    prefix = app.config['UPLOAD_FOLDER'] + '/'
+    files = {path: source for path, source in files.items() if path.startswith(prefix)}
+    if not files:
+        return
+    with app.app_context():
+        sources = set(files.values())
+        # Content-addressed uploads are shared between products, so only sources nobody references are removed
+        referenced = {url for (url,) in db.session.query(ProductImage.url).filter(ProductImage.url.in_(sources))}
+        referenced |= {url for (url,) in db.session.query(ProductPdf.url).filter(ProductPdf.url.in_(sources))}
+        db.session.remove()
+    removed = 0
+    for path, source in files.items():
+        try:
+            # A file saved again since the delete (deduplicated upload) is about to be referenced
+            if source in referenced or os.path.getmtime(path) >= deleted_at:
+                continue
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            app.logger.error("Error removing orphaned upload %s: %s", path, e)
+    metrics.inc('orphaned_uploads_removed_total', removed)
+
+def schedule_orphan_cleanup(files):
+    global cleanup_pool
+    if not files:
+        return
+    with cleanup_lock:
+        if cleanup_pool is None:
+            cleanup_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='upload-cleanup')
+    cleanup_pool.submit(remove_orphaned_uploads, files, time.time())
+
+def batch_delete(product_ids):
+    deleted, files = run_write(lambda: delete_products(product_ids))
+    invalidate_product_cache()
+    schedule_orphan_cleanup(files)
+    return deleted
+
+@app.route('/products/batch-get', methods=['POST'])
+def batch_get_products():
+    data = request.get_json(silent=True) or {}
+    try:
+        ids = batch_ids(data.get('ids'))
+        fields = parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    products = {p.id: p for p in with_fields(Product.query, fields).filter(Product.id.in_(ids))}
+    body = {
+        "products": [products[i].to_dict(fields) for i in ids if i in products],
+        "missing": [i for i in ids if i not in products]
+    }
+    return app.response_class(dumps_json(body), mimetype='application/json')
+
+@app.route('/products/batch', methods=['PATCH'])
+def batch_update_products():
+    # {"products": [{"id": 1, "offer_price": 99.0}, ...]}; only the fields present are changed
+    items = (request.get_json(silent=True) or {}).get('products')
+    try:
+        ids = batch_ids([item.get('id') if isinstance(item, dict) else None for item in items or []])
+        if len(ids) != len(items):
+            raise ValueError("Each id may appear only once")
+        changes = {item['id']: product_values(item, partial=True) for item in items}
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        updated = run_write(lambda: update_products(changes))
+    except StockError as e:
+        return jsonify({"error": str(e), "failures": e.failures}), 409
+    invalidate_product_cache()
+    app.logger.debug("API: Batch updated %s products", len(updated))
+    updated_ids = set(updated)
+    return jsonify({"updated": updated, "missing": [i for i in ids if i not in updated_ids]}), 200
+
+@app.route('/products/batch', methods=['DELETE'])
+def batch_delete_products():
+    try:
+        ids = batch_ids((request.get_json(silent=True) or {}).get('ids'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    deleted = batch_delete(ids)
+    app.logger.debug("API: Batch deleted %s products", len(deleted))
+    deleted_ids = set(deleted)
+    return jsonify({"deleted": deleted, "missing": [i for i in ids if i not in deleted_ids]}), 200
+
+@app.route('/products/changes', methods=['GET'])
+def get_product_changes():
+    # Sync feed: upserts and tombstones with a change_version above since, oldest first.
+    # Mirrors apply the changes and pass next_since back until has_more is false.
+    since = request.args.get('since', 0, type=int)
+    limit = page_size('limit', app.config['MAX_PER_PAGE'])
+    try:
+        fields = parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def build():
+        products = (with_fields(Product.query, fields and fields + ['change_version'])
+                    .filter(Product.change_version > since)
+                    .order_by(Product.change_version).limit(limit + 1).all())
+        tombstones = (ProductTombstone.query.filter(ProductTombstone.change_version > since)
+                      .order_by(ProductTombstone.change_version).limit(limit + 1).all())
+        changes = [{"version": p.change_version, "op": "upsert", "product": p.to_dict(fields)} for p in products]
+        changes += [{"version": t.change_version, "op": "delete", "id": t.product_id, "sku": t.sku} for t in tombstones]
+        changes.sort(key=lambda change: change["version"])
+        page = changes[:limit]
+        current_version = current_change_version()
+        return {
+            "changes": page,
+            "since": since,
+            "next_since": page[-1]["version"] if page else since,
+            "has_more": len(changes) > limit,
+            "current_version": current_version
+        }, []
+
+    return cached_json_response(build)
 
 @app.route('/products', methods=['GET'])
 def get_products():
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
-    products_pagination = Product.query.paginate(page=page, per_page=per_page, error_out=False)
-    return jsonify({
-        "products": [p.to_dict() for p in products_pagination.items],
-        "total_items": products_pagination.total,
-        "total_pages": products_pagination.pages,
-        "current_page": page,
-        "per_page": per_page
-    }), 200
+    try:
+        fields = parse_fields(request.args.get('fields'))
+        after = cursor_arg()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def build():
+        if is_cursor_request():
+            body = cursor_page(with_fields(Product.query, fields), ('products',), fields, after)
+            return body, []
+        page = request.args.get('page', 1, type=int)
+        per_page = page_size('per_page', 10)
+        products_pagination = with_fields(Product.query, fields).paginate(page=page, per_page=per_page, error_out=False)
+        products = [p.to_dict(fields) for p in products_pagination.items]
+        return {
+            "products": products,
+            "total_items": products_pagination.total,
+            "total_pages": products_pagination.pages,
+            "current_page": page,
+            "per_page": per_page
+        }, []
+
+    return cached_json_response(build)
 
 @app.route('/product/<int:product_id>', methods=['GET'])
 def get_product(product_id):
-    product = Product.query.get_or_404(product_id)
-    return jsonify(product.to_dict()), 200
+    try:
+        fields = parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def build():
+        data = with_fields(Product.query, fields).get_or_404(product_id).to_dict(fields)
+        return data, [data]
+
+    return cached_json_response(build)
+
+@app.route('/product/sku/<string:sku>', methods=['GET'])
+def get_product_by_sku(sku):
+    # Matches the product SKU first, then any variant SKU (both columns are indexed)
+    def build():
+        product = with_children(Product.query).filter(Product.sku == sku).first()
+        if product is None:
+            product = (with_children(Product.query).join(ProductVariant)
+                       .filter(ProductVariant.sku == sku).first_or_404())
+        data = product.to_dict()
+        return {**data, "matched_variant": next((v for v in data["variants"] if v["sku"] == sku), None)}, [data]
+
+    return cached_json_response(build)
 
 @app.route('/product/<int:product_id>', methods=['PUT'])
 def update_product(product_id):
     data = request.get_json()
-    product = Product.query.get_or_404(product_id)
-    product.category = data.get('category', product.category)
-    product.product_name = data.get('product_name', product.product_name)
-    product.short_description = data.get('short_description', product.short_description)
-    product.long_description = data.get('long_description', product.long_description)
-    product.mrp = data.get('mrp', product.mrp)
-    product.offer_price = data.get('offer_price', product.offer_price)
-    product.sku = data.get('sku', product.sku)
-    product.in_stock = data.get('in_stock', product.in_stock)
-    product.stock_number = data.get('stock_number', product.stock_number)
-    product.download_pdfs = ",".join(data.get('download_pdfs', product.download_pdfs.split(",") if product.download_pdfs else []))
-    product.product_image_urls = ",".join(data.get('product_image_urls', product.product_image_urls.split(",") if product.product_image_urls else []))
-    product.youtube_links = data.get('youtube_links', product.youtube_links)
-    product.technical_information = data.get('technical_information', product.technical_information)
-    product.manufacturer = data.get('manufacturer', product.manufacturer)
-    product.special_note = data.get('special_note', product.special_note)
-    product.whatsapp_number = data.get('whatsapp_number', product.whatsapp_number)
-    product.is_rubber = data.get('is_rubber', product.is_rubber)
-    product.rubber_density = data.get('rubber_density', product.rubber_density)
-    product.rubber_height = data.get('rubber_height', product.rubber_height)
-    product.rubber_length = data.get('rubber_length', product.rubber_length)
-    product.rubber_thickness = data.get('rubber_thickness', product.rubber_thickness)
-    product.rubber_description = data.get('rubber_description', product.rubber_description)
-    product.variants = json.dumps(data.get('variants', json.loads(product.variants) if product.variants else []))
-    db.session.commit()
-    app.logger.debug(f"API: Updated product ID: {product_id}")
+    try:
+        variants = parse_variants(data['variants']) if 'variants' in data else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def write():
+        product = Product.query.get_or_404(product_id)
+        product.category = data.get('category', product.category)
+        product.product_name = data.get('product_name', product.product_name)
+        product.short_description = data.get('short_description', product.short_description)
+        product.long_description = data.get('long_description', product.long_description)
+        product.mrp = data.get('mrp', product.mrp)
+        product.offer_price = data.get('offer_price', product.offer_price)
+        product.sku = data.get('sku', product.sku)
+        product.in_stock = data.get('in_stock', product.in_stock)
+        product.stock_number = data.get('stock_number', product.stock_number)
+        if 'download_pdfs' in data:
+            product.pdf_urls = split_list(data['download_pdfs'])
+        if 'product_image_urls' in data:
+            product.image_urls = split_list(data['product_image_urls'])
+        if 'youtube_links' in data:
+            product.video_links = split_list(data['youtube_links'])
+        product.technical_information = data.get('technical_information', product.technical_information)
+        product.manufacturer = data.get('manufacturer', product.manufacturer)
+        product.special_note = data.get('special_note', product.special_note)
+        product.whatsapp_number = data.get('whatsapp_number', product.whatsapp_number)
+        product.is_rubber = data.get('is_rubber', product.is_rubber)
+        product.rubber_density = data.get('rubber_density', product.rubber_density)
+        product.rubber_height = data.get('rubber_height', product.rubber_height)
+        product.rubber_length = data.get('rubber_length', product.rubber_length)
+        product.rubber_thickness = data.get('rubber_thickness', product.rubber_thickness)
+        product.rubber_description = data.get('rubber_description', product.rubber_description)
+        if variants is not None:
+            product.variant_data = variants
+        check_stock_numbers([product_id])
+
+    try:
+        run_write(write)
+    except StockError as e:
+        return jsonify({"error": str(e), "failures": e.failures}), 409
+    invalidate_product_cache()
+    app.logger.debug("API: Updated product ID: %s", product_id)
     return jsonify({"message": "Product updated"}), 200
 
 @app.route('/product/<int:product_id>', methods=['DELETE'])
 def delete_product(product_id):
-    product = Product.query.get_or_404(product_id)
-    db.session.delete(product)
-    db.session.commit()
-    app.logger.debug(f"API: Deleted product ID: {product_id}")
+    if not batch_delete([product_id]):
+        abort(404)
+    app.logger.debug("API: Deleted product ID: %s", product_id)
     return jsonify({"message": "Product deleted"}), 200
 
+# Stock changes are single conditional UPDATEs, so concurrent checkouts never read-modify-write.
+# available = stock_number - stock_reserved; in_stock follows available > 0.
+class StockError(Exception):
+    def __init__(self, failures, message="Insufficient stock"):
+        super().__init__(message)
+        self.failures = failures
+
+def stock_update(op, quantity, from_reservation=False):
+    # Returns (condition, values) for one line; the SET expressions all see the row's old values
+    product_table = Product.__table__
+    stock = func.coalesce(product_table.c.stock_number, 0)
+    reserved = product_table.c.stock_reserved
+    available = stock - reserved
+    if op == 'reserve':
+        return available >= quantity, {"stock_reserved": reserved + quantity, "in_stock": available - quantity > 0}
+    if op == 'release':
+        return reserved >= quantity, {"stock_reserved": reserved - quantity, "in_stock": available + quantity > 0}
+    if from_reservation:
+        # Ships stock that was reserved earlier: both counters drop, availability is unchanged
+        return reserved >= quantity, {"stock_number": stock - quantity, "stock_reserved": reserved - quantity,
+                                      "in_stock": available > 0}
+    return available >= quantity, {"stock_number": stock - quantity, "in_stock": available - quantity > 0}
+
+def apply_stock_lines(op, lines, from_reservation=False):
+    # lines maps product_id -> quantity; all lines apply or none do
+    product_table = Product.__table__
+    results, failures = [], []
+    # Lock rows in id order so two multi-line orders can't deadlock on databases with row locks
+    for product_id, quantity in sorted(lines.items()):
+        condition, values = stock_update(op, quantity, from_reservation)
+        row = db.session.execute(
+            product_table.update().where(product_table.c.id == product_id, condition).values(**values)
+            .returning(product_table.c.id, product_table.c.sku, product_table.c.stock_number,
+                       product_table.c.stock_reserved, product_table.c.in_stock)
+        ).first()
+        if row is None:
+            failures.append({"id": product_id, "quantity": quantity})
+            continue
+        results.append({"id": row.id, "sku": row.sku, "quantity": quantity, "stock_number": row.stock_number,
+                        "stock_reserved": row.stock_reserved, "available": row.stock_number - row.stock_reserved,
+                        "in_stock": bool(row.in_stock)})
+    if failures:
+        raise StockError(failures)
+    return results
+
+def check_stock_numbers(product_ids):
+    # Runs after an edit, inside its transaction (which now holds the rows), so a stock_number
+    # below what open checkouts hold rolls the whole edit back
+    if not product_ids:
+        return
+    rows = (db.session.query(Product.id, Product.stock_number)
+            .filter(Product.id.in_(list(product_ids)), func.coalesce(Product.stock_number, 0) < Product.stock_reserved)
+            .order_by(Product.id).all())
+    if rows:
+        raise StockError([{"id": product_id, "stock_number": stock_number} for product_id, stock_number in rows],
+                         "stock_number is below stock_reserved")
+
+STOCK_OPS = ('reserve', 'release', 'decrement')
+
+def parse_stock_request(data):
+    op = data.get('op')
+    if op not in STOCK_OPS:
+        raise ValueError(f"op must be one of: {', '.join(STOCK_OPS)}")
+    from_reservation = bool(data.get('from_reservation'))
+    if from_reservation and op != 'decrement':
+        raise ValueError("from_reservation only applies to decrement")
+    return op, from_reservation
+
+def stock_quantity(value):
+    if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+        raise ValueError("quantity must be a positive integer")
+    return value
+
+def stock_response(op, lines, from_reservation):
+    try:
+        results = run_write(lambda: apply_stock_lines(op, lines, from_reservation))
+    except StockError as e:
+        return jsonify({"error": str(e), "failures": e.failures}), 409
+    invalidate_product_cache()
+    return jsonify({"op": op, "lines": results}), 200
+
+@app.route('/product/<int:product_id>/stock', methods=['POST'])
+def update_product_stock(product_id):
+    # {"op": "reserve" | "release" | "decrement", "quantity": 2, "from_reservation": false}
+    data = request.get_json(silent=True) or {}
+    try:
+        op, from_reservation = parse_stock_request(data)
+        quantity = stock_quantity(data.get('quantity'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not db.session.query(Product.id).filter(Product.id == product_id).first():
+        abort(404)
+    return stock_response(op, {product_id: quantity}, from_reservation)
+
+@app.route('/products/stock', methods=['POST'])
+def update_products_stock():
+    # Order lines for several products in one transaction:
+    # {"op": "decrement", "lines": [{"sku": "A-1", "quantity": 2}, {"id": 7, "quantity": 1}]}
+    data = request.get_json(silent=True) or {}
+    lines = data.get('lines')
+    try:
+        op, from_reservation = parse_stock_request(data)
+        if not isinstance(lines, list) or not lines:
+            raise ValueError("Expected a non-empty list of lines")
+        if len(lines) > app.config['BATCH_MAX_IDS']:
+            raise ValueError(f"At most {app.config['BATCH_MAX_IDS']} lines per request")
+        if not all(isinstance(line, dict) for line in lines):
+            raise ValueError("Each line must be an object with an id or sku and a quantity")
+        skus = [line['sku'] for line in lines if 'id' not in line and line.get('sku')]
+        ids_by_sku = dict(db.session.query(Product.sku, Product.id).filter(Product.sku.in_(skus))) if skus else {}
+        quantities, missing = {}, []
+        for line in lines:
+            quantity = stock_quantity(line.get('quantity'))
+            if 'id' in line and (not isinstance(line['id'], int) or isinstance(line['id'], bool)):
+                raise ValueError("Ids must be integers")
+            product_id = line['id'] if 'id' in line else ids_by_sku.get(line.get('sku'))
+            if product_id is None:
+                missing.append(line)
+                continue
+            # Lines for the same product are summed into one UPDATE
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if missing:
+        return jsonify({"error": "Unknown products", "missing": missing}), 404
+    return stock_response(op, quantities, from_reservation)
+
 @app.route('/search', methods=['GET'])
 def search_products():
     query = request.args.get('q', '').lower()
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
-    search_results_pagination = Product.query.filter(
-        Product.product_name.ilike(f'%{query}%') |
-        Product.category.ilike(f'%{query}%') |
-        Product.short_description.ilike(f'%{query}%') |
-        Product.long_description.ilike(f'%{query}%') |
-        Product.rubber_description.ilike(f'%{query}%')
-    ).paginate(page=page, per_page=per_page, error_out=False)
-    return jsonify({
-        "products": [p.to_dict() for p in search_results_pagination.items],
-        "total_items": search_results_pagination.total,
-        "total_pages": search_results_pagination.pages,
-        "current_page": page,
-        "per_page": per_page
-    }), 200
+    try:
+        fields = parse_fields(request.args.get('fields'))
+        after = cursor_arg()
+        # Cursors seek on id, which would throw away the relevance and nearest-dimension orderings
+        if is_cursor_request() and query:
+            raise ValueError("Ranked q= searches need page-based pagination")
+        if is_cursor_request() and dimension_targets(request.args):
+            raise ValueError("near_* ordering needs page-based pagination")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def build():
+        search_query = within_dimensions(apply_search(Product.query, query), dimension_ranges(request.args))
+        if is_cursor_request():
+            ranges = sorted(dimension_ranges(request.args).items())
+            body = cursor_page(with_fields(search_query, fields), ('search', query, tuple(ranges)), fields, after)
+            return body, []
+        page = request.args.get('page', 1, type=int)
+        per_page = page_size('per_page', 10)
+        search_results_pagination = paginate_products(search_query, request.args, page, per_page, fields)
+        products = [p.to_dict(fields) for p in search_results_pagination.items]
+        return {
+            "products": products,
+            "total_items": search_results_pagination.total,
+            "total_pages": search_results_pagination.pages,
+            "current_page": page,
+            "per_page": per_page
+        }, []
+
+    return cached_json_response(build)
+
+@app.before_request
+def start_suggest_index():
+    # After the first request in a process this is a single pid comparison
+    suggest_index.ensure_started()
+
+@app.route('/suggest', methods=['GET'])
+def suggest():
+    limit = max(1, min(request.args.get('limit', app.config['SUGGEST_LIMIT'], type=int) or 1,
+                       app.config['SUGGEST_MAX_LIMIT']))
+    if not suggest_index.ready.wait(app.config['SUGGEST_READY_TIMEOUT']):
+        response = jsonify({"error": "Suggestions are still loading"})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    query = request.args.get('q', '')
+    return jsonify({"query": query, "suggestions": suggest_index.suggest(query, limit)})
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# Catalog export
+def csv_cell(value):
+    if isinstance(value, list):
+        return ",".join(value) if all(isinstance(item, str) for item in value) else json.dumps(value)
+    return value
+
+def export_chunks(fmt, fields):
+    # Server-side batches keep memory flat regardless of catalog size
+    products = with_fields(Product.query, fields).order_by(Product.id).yield_per(app.config['EXPORT_BATCH_SIZE'])
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+        for product in products:
+            data = product.to_dict(fields)
+            writer.writerow([csv_cell(data[f]) for f in fields])
+            if buffer.tell() > 64 * 1024:
+                yield buffer.getvalue().encode('utf-8')
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue().encode('utf-8')
+        return
+    lines = []
+    for product in products:
+        lines.append(dumps_json(product.to_dict(fields)))
+        if len(lines) >= 256:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+@app.route('/products/export', methods=['GET'])
+def export_products():
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in ('ndjson', 'csv'):
+        return jsonify({"error": f"Unsupported format: {fmt}"}), 400
+    try:
+        fields = parse_fields(request.args.get('fields')) or PRODUCT_FIELDS
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    chunks = export_chunks(fmt, fields)
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    headers = {"Content-Disposition": f"attachment; filename=products.{fmt}", "Vary": 'Accept-Encoding'}
+    # accept_encodings honours q-values, so "gzip;q=0" turns compression off
+    if request.args.get('gzip') == 'true' or request.accept_encodings['gzip']:
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = 'gzip'
+    return app.response_class(stream_with_context(chunks), mimetype=mimetype, headers=headers)
+
+@app.cli.command('export-products')
+@click.option('--format', 'fmt', type=click.Choice(['ndjson', 'csv']), default='ndjson')
+@click.option('--fields', default='', help='Comma-separated list of fields to export.')
+@click.option('--gzip', 'use_gzip', is_flag=True, help='Gzip the output.')
+@click.option('--output', '-o', type=click.Path(dir_okay=False, writable=True), default='-')
+def export_products_command(fmt, fields, use_gzip, output):
+    """Stream the whole catalog to a file or stdout."""
+    try:
+        fields = parse_fields(fields) or PRODUCT_FIELDS
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='--fields')
+    chunks = export_chunks(fmt, fields)
+    if use_gzip:
+        chunks = gzip_chunks(chunks)
+    with click.open_file(output, 'wb') as out:
+        for chunk in chunks:
+            out.write(chunk)
+
+@app.cli.command('backfill-renditions')
+@click.option('--force', is_flag=True, help='Re-render images that already have renditions.')
+def backfill_renditions_command(force):
+    """Render thumbnails and WebP variants for existing uploads."""
+    if Image is None:
+        raise click.ClickException("Pillow is not installed.")
+    pending = {}
+    for product in with_children(Product.query).order_by(Product.id).yield_per(app.config['EXPORT_BATCH_SIZE']):
+        done = {url for url, r in product.images_with_renditions() if r} if not force else set()
+        urls = [url for url in renderable_images(product.image_urls) if url not in done]
+        if urls:
+            pending[product.id] = urls
+    render_pool, _ = rendition_pools.get()
+    futures = {product_id: render_pool.submit(render_renditions, urls, app.config['RENDITIONS_FOLDER'],
+                                              app.config['RENDITION_SIZES'], app.config['RENDITION_QUALITY'])
+               for product_id, urls in pending.items()}
+    for product_id, future in futures.items():
+        store_renditions(product_id, future.result())
+    print(f"Rendered images for {len(pending)} products.")
+
+@app.cli.command('precompress-static')
+@click.option('--force', is_flag=True, help='Recompress files whose variants are up to date.')
+def precompress_static_command(force):
+    """Write .gz (and .br with brotli installed) variants of compressible static files."""
+    codings = ['gzip', 'br'] if brotli is not None else ['gzip']
+    written = 0
+    for root, _, filenames in os.walk(app.static_folder):
+        for filename in filenames:
+            path = os.path.join(root, filename)
+            if os.path.splitext(filename)[1].lower() not in app.config['PRECOMPRESS_EXTENSIONS']:
+                continue
+            with open(path, 'rb') as f:
+                data = None
+                for coding in codings:
+                    target = path + PRECOMPRESSED_SUFFIXES[coding]
+                    if not force and os.path.isfile(target) and os.path.getmtime(target) >= os.path.getmtime(path):
+                        continue
+                    data = f.read() if data is None else data
+                    body = compress_body(data, coding, 11 if coding == 'br' else 9)
+                    # Keep only variants that actually save bytes; send_precompressed falls back to the original
+                    if len(body) < len(data):
+                        with open(target, 'wb') as out:
+                            out.write(body)
+                        written += 1
+    print(f"Wrote {written} precompressed files.")
 
 if __name__ == '__main__':
     app.run(debug=True, port=5001)
\ No newline at end of file
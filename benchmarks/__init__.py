@@ -0,0 +1,5 @@
+"""Load-test and micro-benchmark suite for the product catalog app.
+
+Seed a synthetic catalog with ``python -m benchmarks.catalog`` and drive the
+app with ``python -m benchmarks.run``; see ``python -m benchmarks.run --help``.
+"""
@@ -0,0 +1,123 @@
+"""Synthetic catalog generator.
+
+Builds reproducible product rows (rubber products, variants, images, PDFs and
+video links included) and bulk-inserts them through the app's models, so the
+search, facet and dimension-index triggers pay their real cost.
+
+    DATABASE_URL=sqlite:////tmp/bench.db python -m benchmarks.catalog --rows 100000
+"""
+import argparse
+import os
+import random
+import time
+
+from sqlalchemy import insert
+
+CATEGORIES = ['Rubber Sheets', 'Gaskets', 'O-Rings', 'Hoses', 'Foam', 'Mats', 'Seals', 'Belts', 'Tubing', 'Adhesives']
+MANUFACTURERS = ['Acme Polymers', 'Northwind Rubber', 'Globex Industrial', 'Initech Seals', 'Umbrella Elastomers']
+WORDS = (
+    'neoprene nitrile silicone epdm viton natural butyl sheet roll strip gasket seal ring hose foam mat '
+    'industrial food grade heat resistant oil resistant abrasion black red white blue high density soft '
+    'durable flexible anti slip insertion reinforced cloth ribbed smooth textured commercial marine'
+).split()
+
+
+def product_row(rng, index):
+    is_rubber = rng.random() < 0.3
+    mrp = round(rng.uniform(5, 5000), 2)
+    stock = rng.randint(0, 500)
+    row = {
+        "category": rng.choice(CATEGORIES),
+        "product_name": " ".join(rng.choice(WORDS).title() for _ in range(3)),
+        "short_description": " ".join(rng.choice(WORDS) for _ in range(12)),
+        "long_description": " ".join(rng.choice(WORDS) for _ in range(120)),
+        "mrp": mrp,
+        "offer_price": round(mrp * rng.uniform(0.6, 1.0), 2),
+        "sku": f"SKU-{index:08d}",
+        "in_stock": stock > 0,
+        "stock_number": stock,
+        "technical_information": "<p>" + " ".join(rng.choice(WORDS) for _ in range(60)) + "</p>",
+        "manufacturer": rng.choice(MANUFACTURERS),
+        "special_note": None,
+        "whatsapp_number": "+910000000000",
+        "is_rubber": is_rubber,
+        "rubber_density": round(rng.uniform(0.9, 1.6), 2) if is_rubber else None,
+        "rubber_height": round(rng.uniform(100, 2000), 1) if is_rubber else None,
+        "rubber_length": round(rng.uniform(100, 10000), 1) if is_rubber else None,
+        "rubber_thickness": round(rng.uniform(0.5, 50), 1) if is_rubber else None,
+        "rubber_description": " ".join(rng.choice(WORDS) for _ in range(20)) if is_rubber else None,
+    }
+    children = {
+        "variants": [{"name": f"{rng.choice(WORDS)} {n}", "price": round(mrp * rng.uniform(0.8, 1.5), 2),
+                      "sku": f"SKU-{index:08d}-V{n}"} for n in range(rng.randint(0, 3))],
+        "images": [f"static/uploads/bench-{index}-{n}.jpg" for n in range(rng.randint(1, 4))],
+        "pdfs": ["static/uploads/bench-datasheet.pdf"] if rng.random() < 0.2 else [],
+        "videos": ["https://www.youtube.com/watch?v=bench"] if rng.random() < 0.1 else [],
+    }
+    return row, children
+
+
+def generate(rows, seed=0):
+    rng = random.Random(seed)
+    for index in range(rows):
+        yield product_row(rng, index)
+
+
+def seed_catalog(rows, seed=0, chunk_size=5000, reset=False):
+    """Insert ``rows`` synthetic products into the app's database; returns seconds taken."""
+    # app reads DATABASE_URL when it is imported, so it is imported only once that is set
+    from app import app, db, Product, ProductVariant, ProductImage, ProductPdf, ProductVideo
+
+    started = time.perf_counter()
+    with app.app_context():
+        if reset:
+            for model in (ProductVariant, ProductImage, ProductPdf, ProductVideo, Product):
+                db.session.execute(model.__table__.delete())
+            db.session.commit()
+        chunk = []
+        for item in generate(rows, seed):
+            chunk.append(item)
+            if len(chunk) >= chunk_size:
+                insert_chunk(chunk)
+                chunk = []
+        if chunk:
+            insert_chunk(chunk)
+    return time.perf_counter() - started
+
+
+def insert_chunk(chunk):
+    from app import db, reserve_versions, Product, ProductVariant, ProductImage, ProductPdf, ProductVideo
+
+    # One change-feed version block per chunk rather than a sequence bump per row
+    first_version = reserve_versions(db.session.connection(), len(chunk))
+    rows = [{**row, "change_version": first_version + i} for i, (row, _) in enumerate(chunk)]
+    ids = dict(db.session.execute(insert(Product).returning(Product.sku, Product.id), rows).all())
+    variants, images, pdfs, videos = [], [], [], []
+    for row, children in chunk:
+        product_id = ids[row["sku"]]
+        variants += [{"product_id": product_id, "position": i, **v} for i, v in enumerate(children["variants"])]
+        images += [{"product_id": product_id, "position": i, "url": url} for i, url in enumerate(children["images"])]
+        pdfs += [{"product_id": product_id, "position": i, "url": url} for i, url in enumerate(children["pdfs"])]
+        videos += [{"product_id": product_id, "position": i, "url": url} for i, url in enumerate(children["videos"])]
+    for model, child_rows in ((ProductVariant, variants), (ProductImage, images), (ProductPdf, pdfs), (ProductVideo, videos)):
+        if child_rows:
+            db.session.execute(model.__table__.insert(), child_rows)
+    db.session.commit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--reset', action='store_true', help='Delete existing products first.')
+    parser.add_argument('--database-url', help='Defaults to $DATABASE_URL, then the app default.')
+    args = parser.parse_args(argv)
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    elapsed = seed_catalog(args.rows, args.seed, args.chunk_size, args.reset)
+    print(f"Seeded {args.rows} products in {elapsed:.1f}s ({args.rows / elapsed:.0f} rows/s).")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,307 @@
+"""Drive the app with concurrent clients and report latency percentiles as JSON.
+
+By default the app runs in-process behind Flask's test client against a
+throwaway SQLite database seeded with a synthetic catalog:
+
+    python -m benchmarks.run --rows 10000 --clients 8 --requests 2000
+
+``--serve gunicorn`` starts a local gunicorn instead and drives it over HTTP,
+and ``--url`` targets an already running server (seed it with
+``python -m benchmarks.catalog`` first).
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+SCENARIOS = ['list_products', 'search', 'get_product', 'add_product', 'index', 'delete_selected']
+SEARCH_TERMS = ['neoprene', 'silicone gasket', 'oil resistant', 'foam', 'nit', 'high density sheet']
+DELETE_BATCH = 5  # products per delete_selected request
+BENCH_USER = ('bench', 'bench-password')
+
+
+class TestClientTransport:
+    """Calls the app in-process; one Flask test client per thread, all sharing one login session."""
+
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+        self.session_cookie = None
+
+    def login(self):
+        login(self)
+        self.session_cookie = self.client().get_cookie('session').value
+
+    def client(self):
+        if not hasattr(self.local, 'client'):
+            self.local.client = self.app.test_client()
+            if self.session_cookie:
+                self.local.client.set_cookie('session', self.session_cookie)
+        return self.local.client
+
+    def request(self, method, path, json_body=None, form=None):
+        response = self.client().open(path, method=method, json=json_body, data=form)
+        response.close()
+        return response.status_code
+
+    def get_json(self, path):
+        return self.client().get(path).get_json()
+
+
+class HttpTransport:
+    """Calls a running server over HTTP with urllib; threads share one cookie jar."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        jar = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar), NoRedirect)
+
+    def login(self):
+        login(self)
+
+    def request(self, method, path, json_body=None, form=None):
+        data, headers = None, {}
+        if json_body is not None:
+            data, headers = json.dumps(json_body).encode(), {'Content-Type': 'application/json'}
+        elif form is not None:
+            data = urllib.parse.urlencode(form, doseq=True).encode()
+            headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with self.opener.open(req, timeout=60) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code
+
+    def get_json(self, path):
+        with self.opener.open(self.base_url + path, timeout=60) as response:
+            return json.loads(response.read())
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    # Report the 302 the UI routes answer with instead of following it
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def login(transport):
+    # Password hashing is deliberately slow, so log in once up front rather than per client
+    username, password = BENCH_USER
+    transport.request('POST', '/register', form={'username': username, 'password': password})
+    transport.request('POST', '/login', form={'username': username, 'password': password})
+
+
+def catalog_ids(transport):
+    # The real ids, walked with the cursor API: the catalog needn't start at 1 or be contiguous
+    ids, after = [], None
+    while True:
+        query = {'limit': 100, 'fields': 'id', **({'after': after} if after else {})}
+        body = transport.get_json('/products?' + urllib.parse.urlencode(query))
+        ids += [product['id'] for product in body['products']]
+        after = body['next_cursor']
+        if not after:
+            return ids
+
+
+class Workload:
+    """Picks request arguments; the highest ids are reserved for delete_selected."""
+
+    def __init__(self, ids, seed, deletes=0):
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        # Enough ids for every delete_selected request, but never more than half the catalog
+        reserved = min(deletes * DELETE_BATCH, len(ids) // 2)
+        self.read_ids = ids[:len(ids) - reserved] or ids
+        self.deletable = ids[len(ids) - reserved:]
+        self.added = 0
+
+    def pick(self, fn, *args):
+        with self.lock:
+            return fn(*args)
+
+    def call(self, transport, scenario):
+        if scenario == 'list_products':
+            page = self.pick(self.rng.randint, 1, max(1, len(self.read_ids) // 10))
+            return transport.request('GET', f'/products?page={page}&per_page=10')
+        if scenario == 'search':
+            term = self.pick(self.rng.choice, SEARCH_TERMS)
+            return transport.request('GET', '/search?' + urllib.parse.urlencode({'q': term}))
+        if scenario == 'get_product':
+            return transport.request('GET', f'/product/{self.pick(self.rng.choice, self.read_ids)}')
+        if scenario == 'add_product':
+            with self.lock:
+                self.added += 1
+                n = self.added
+            return transport.request('POST', '/add-product', json_body={
+                'sku': f'BENCH-ADD-{n}', 'product_name': f'Bench Product {n}', 'category': 'Benchmark',
+                'mrp': 10.0, 'offer_price': 9.0, 'variants': [{'name': 'Default', 'price': 9.0, 'sku': f'BENCH-ADD-{n}-V'}],
+                'product_image_urls': [f'static/uploads/bench-add-{n}.jpg']
+            })
+        if scenario == 'index':
+            page = self.pick(self.rng.randint, 1, max(1, len(self.read_ids) // 10))
+            return transport.request('GET', f'/?page={page}')
+        if scenario == 'delete_selected':
+            with self.lock:
+                ids = [self.deletable.pop() for _ in range(min(DELETE_BATCH, len(self.deletable)))]
+            if not ids:
+                return None  # pool used up; the scenario stops rather than timing no-op deletes
+            return transport.request('POST', '/delete-selected', form={'product_ids[]': [str(i) for i in ids]})
+        raise ValueError(f"Unknown scenario: {scenario}")
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def run_scenario(transport, workload, scenario, clients, requests):
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def worker(count):
+        nonlocal errors
+        local = []
+        local_errors = 0
+        for _ in range(count):
+            started = time.perf_counter()
+            status = workload.call(transport, scenario)
+            if status is None:
+                break
+            local.append((time.perf_counter() - started) * 1000.0)
+            if status >= 400:
+                local_errors += 1
+        with lock:
+            latencies.extend(local)
+            errors += local_errors
+
+    shares = [requests // clients + (1 if i < requests % clients else 0) for i in range(clients)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(worker, [s for s in shares if s]))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    if not latencies:
+        return {"requests": 0, "errors": 0, "skipped": requests}
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "skipped": requests - len(latencies),
+        "duration_s": round(elapsed, 4),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "max": round(latencies[-1], 3),
+            "mean": round(sum(latencies) / len(latencies), 3)
+        }
+    }
+
+
+def peak_rss_kb(who=resource.RUSAGE_SELF):
+    peak = resource.getrusage(who).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak  # macOS reports bytes, Linux kilobytes
+
+
+def start_gunicorn(port, workers, env):
+    command = [sys.executable, '-m', 'gunicorn', '-w', str(workers), '-b', f'127.0.0.1:{port}', 'app:app']
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/products?per_page=1', timeout=2).read()
+            return process
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.25)
+    process.terminate()
+    raise RuntimeError("gunicorn did not start within 60s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000, help='Synthetic catalog size to seed.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--clients', type=int, default=8, help='Concurrent client threads.')
+    parser.add_argument('--requests', type=int, default=1000, help='Requests per scenario.')
+    parser.add_argument('--warmup', type=int, default=50, help='Unmeasured requests per scenario.')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--serve', choices=['testclient', 'gunicorn'], default='testclient')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn workers for --serve gunicorn.')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--url', help='Benchmark an already running, already seeded server.')
+    parser.add_argument('--database-url', help='Use this database instead of a throwaway SQLite file.')
+    parser.add_argument('--output', '-o', help='Write the JSON report here instead of stdout.')
+    args = parser.parse_args(argv)
+
+    scenarios = [s.strip() for s in args.scenarios.split(',') if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    workdir = tempfile.mkdtemp(prefix='catalog-bench-')
+    database_url = args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    report = {
+        "config": {**vars(args), "database_url": database_url if not args.url else None},
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "scenarios": {}
+    }
+
+    process = None
+    if args.url:
+        transport = HttpTransport(args.url)
+    else:
+        os.environ['DATABASE_URL'] = database_url
+        from benchmarks.catalog import seed_catalog
+        report["seed_s"] = round(seed_catalog(args.rows, args.seed), 3)
+        if args.serve == 'gunicorn':
+            process = start_gunicorn(args.port, args.workers, dict(os.environ))
+            transport = HttpTransport(f'http://127.0.0.1:{args.port}')
+        else:
+            from app import app
+            transport = TestClientTransport(app)
+
+    try:
+        transport.login()
+        ids = catalog_ids(transport)
+        workload = Workload(ids, args.seed, args.requests if 'delete_selected' in scenarios else 0)
+        report["catalog_rows"] = len(ids)
+        report["delete_pool"] = len(workload.deletable)
+        for scenario in scenarios:
+            if args.warmup and scenario != 'delete_selected':
+                run_scenario(transport, workload, scenario, args.clients, args.warmup)
+            report["scenarios"][scenario] = run_scenario(transport, workload, scenario, args.clients, args.requests)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    report["peak_rss_kb"] = {"benchmark": peak_rss_kb()}
+    if process is not None:
+        report["peak_rss_kb"]["server_largest_worker"] = peak_rss_kb(resource.RUSAGE_CHILDREN)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as out:
+            out.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
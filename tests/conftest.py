@@ -0,0 +1,57 @@
+import os
+import tempfile
+import time
+
+import pytest
+from sqlalchemy import text
+
+# app.py reads its database URL at import time, and keeps uploads under the working directory
+os.chdir(tempfile.mkdtemp())
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(os.getcwd(), 'test.db'))
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+from app import app as flask_app, db, invalidate_product_cache  # noqa: E402
+
+PRODUCT_TABLES = ['product_variant', 'product_image', 'product_pdf', 'product_video', 'product_tombstone', 'product']
+
+
+@pytest.fixture
+def app():
+    # Triggers keep the search, facet and dimension tables in step with the deletes
+    with flask_app.app_context():
+        for table in PRODUCT_TABLES:
+            db.session.execute(text(f'DELETE FROM {table}'))
+        db.session.commit()
+    invalidate_product_cache()
+    yield flask_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def ui_client(client):
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+    return client
+
+
+@pytest.fixture
+def wait_for():
+    def wait(condition, timeout=10):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            assert time.monotonic() < deadline, 'timed out'
+            time.sleep(0.05)
+    return wait
+
+
+@pytest.fixture
+def add_product(client):
+    def add(**fields):
+        response = client.post('/add-product', json=fields)
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()['product_id']
+    return add
@@ -0,0 +1,63 @@
+import io
+import os
+
+import app as catalog
+
+
+def test_batch_get_keeps_request_order_and_reports_missing(client, add_product):
+    first = add_product(product_name='One', sku='B-1')
+    second = add_product(product_name='Two', sku='B-2')
+    body = client.post('/products/batch-get?fields=sku', json={'ids': [second, 999, first, second]}).get_json()
+    # Duplicates are folded into the first occurrence
+    assert body == {'products': [{'sku': 'B-2'}, {'sku': 'B-1'}], 'missing': [999]}
+    assert client.post('/products/batch-get', json={'ids': []}).status_code == 400
+    assert client.post('/products/batch-get', json={'ids': ['1']}).status_code == 400
+
+
+def test_batch_update_changes_only_given_fields(client, add_product):
+    first = add_product(product_name='One', sku='B-1', offer_price=10)
+    second = add_product(product_name='Two', sku='B-2', offer_price=20)
+    response = client.patch('/products/batch', json={'products': [
+        {'id': first, 'offer_price': 11}, {'id': second, 'product_name': 'Deux'}, {'id': 999, 'offer_price': 1}]})
+    assert response.get_json() == {'updated': [first, second], 'missing': [999]}
+    products = client.post('/products/batch-get?fields=product_name,offer_price', json={'ids': [first, second]}).get_json()
+    assert products['products'] == [{'product_name': 'One', 'offer_price': 11}, {'product_name': 'Deux', 'offer_price': 20}]
+
+
+def test_batch_update_rejects_duplicate_ids(client, add_product):
+    product_id = add_product(product_name='One', sku='B-1')
+    response = client.patch('/products/batch', json={'products': [
+        {'id': product_id, 'offer_price': 1}, {'id': product_id, 'offer_price': 2}]})
+    assert response.status_code == 400
+    assert client.get(f'/product/{product_id}').get_json()['offer_price'] != 1
+
+
+def test_batch_delete_reports_missing(client, add_product):
+    first = add_product(product_name='One', sku='B-1')
+    second = add_product(product_name='Two', sku='B-2')
+    assert client.delete('/products/batch', json={'ids': [first, 999]}).get_json() == {'deleted': [first], 'missing': [999]}
+    assert client.get(f'/product/{first}').status_code == 404
+    assert client.get(f'/product/{second}').status_code == 200
+
+
+def add_with_pdf(ui_client, sku, content):
+    response = ui_client.post('/add', data={'product_name': sku, 'sku': sku, 'pdfs': (io.BytesIO(content), 'sheet.pdf')},
+                              content_type='multipart/form-data')
+    assert response.status_code == 302
+    return ui_client.get(f'/product/sku/{sku}').get_json()
+
+
+def test_orphan_cleanup_keeps_files_still_referenced(ui_client, client, wait_for):
+    first = add_with_pdf(ui_client, 'B-1', b'%PDF-1.4 shared')
+    second = add_with_pdf(ui_client, 'B-2', b'%PDF-1.4 shared')
+    # The second upload was deduplicated onto the first one's file
+    assert first['download_pdfs'] == second['download_pdfs']
+    path = first['download_pdfs'][0]
+    assert os.path.exists(path)
+
+    client.delete('/products/batch', json={'ids': [first['id']]})
+    catalog.cleanup_pool.submit(lambda: None).result(5)  # the cleanup thread has finished with that delete
+    assert os.path.exists(path)
+
+    client.delete('/products/batch', json={'ids': [second['id']]})
+    wait_for(lambda: not os.path.exists(path))
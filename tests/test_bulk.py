@@ -0,0 +1,61 @@
+import json
+
+
+def post_ndjson(client, lines):
+    body = b''.join((json.dumps(line).encode() if isinstance(line, dict) else line) + b'\n' for line in lines)
+    return client.post('/products/bulk', data=body, content_type='application/x-ndjson')
+
+
+def test_bulk_inserts_then_updates_by_sku(client):
+    result = post_ndjson(client, [{'sku': 'B-1', 'product_name': 'One'}, {'sku': 'B-2', 'product_name': 'Two'}]).get_json()
+    assert (result['inserted'], result['updated'], result['failed']) == (2, 0, 0)
+    result = post_ndjson(client, [{'sku': 'B-1', 'product_name': 'Uno'}]).get_json()
+    assert (result['inserted'], result['updated']) == (0, 1)
+    assert client.get('/product/sku/B-1').get_json()['product_name'] == 'Uno'
+
+
+def test_bulk_reports_row_errors_without_aborting(client):
+    result = post_ndjson(client, [
+        {'sku': 'B-1', 'product_name': 'One'},
+        b'{not json',
+        {'product_name': 'No sku'},
+        b'[1, 2]',
+        {'sku': 'B-2', 'product_name': 'Two'},
+    ]).get_json()
+    assert (result['inserted'], result['failed']) == (2, 3)
+    assert [error['line'] for error in result['errors']] == [2, 3, 4]
+
+
+def test_bulk_invalid_utf8_fails_only_its_row(client):
+    response = post_ndjson(client, [{'sku': 'E1'}, b'\xff\xfe bad', {'sku': 'E2'}])
+    assert response.status_code == 200
+    result = response.get_json()
+    assert (result['inserted'], result['failed']) == (2, 1)
+    assert result['errors'] == [{'line': 2, 'sku': None, 'error': 'Invalid UTF-8'}]
+
+
+def test_bulk_csv_invalid_utf8_fails_only_its_row(client):
+    body = b'sku,product_name\nC-1,One\nC-2,Bad \xff name\nC-3,Three\n'
+    result = client.post('/products/bulk', data=body, content_type='text/csv').get_json()
+    assert (result['inserted'], result['failed']) == (2, 1)
+    assert result['errors'][0]['line'] == 3
+
+
+def test_bulk_numeric_sku_matches_the_stored_string(client):
+    result = post_ndjson(client, [{'sku': 312312, 'product_name': 'Numeric'}]).get_json()
+    assert (result['inserted'], result['failed']) == (1, 0)
+    result = post_ndjson(client, [{'sku': 312312, 'product_name': 'Renamed'}, {'sku': [1], 'product_name': 'List'}]).get_json()
+    assert (result['updated'], result['failed']) == (1, 1)
+    assert client.get('/product/sku/312312').get_json()['product_name'] == 'Renamed'
+
+
+def test_bulk_failed_row_in_a_chunk_keeps_the_others(client):
+    result = post_ndjson(client, [
+        {'sku': 'B-1', 'product_name': 'One'},
+        {'sku': 'B-2', 'product_name': {'not': 'a string'}},
+        {'sku': 'B-3', 'product_name': 'Three', 'variants': ['x']},
+        {'sku': 'B-4', 'product_name': 'Four'},
+    ]).get_json()
+    assert (result['inserted'], result['failed']) == (2, 2)
+    assert sorted(error['sku'] for error in result['errors']) == ['B-2', 'B-3']
+    assert [p['sku'] for p in client.get('/products?fields=sku').get_json()['products']] == ['B-1', 'B-4']
@@ -0,0 +1,48 @@
+from app import Product, db, run_write
+
+
+def test_etag_answers_if_none_match_with_304(client, add_product):
+    product_id = add_product(product_name='Sheet', sku='S-1')
+    first = client.get(f'/product/{product_id}')
+    assert first.status_code == 200 and first.headers['ETag']
+    again = client.get(f'/product/{product_id}', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+    assert again.headers['X-Cache'] == 'HIT'
+
+
+def test_write_invalidates_cached_reads(client, add_product):
+    product_id = add_product(product_name='Sheet', sku='S-1')
+    etag = client.get(f'/product/{product_id}').headers['ETag']
+    client.put(f'/product/{product_id}', json={'product_name': 'Renamed'})
+    response = client.get(f'/product/{product_id}', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['product_name'] == 'Renamed'
+
+
+def test_single_product_has_last_modified(client, add_product):
+    product_id = add_product(product_name='Sheet', sku='S-1')
+    assert client.get(f'/product/{product_id}').last_modified is not None
+
+
+def test_list_delete_is_not_hidden_by_if_modified_since(client, add_product):
+    add_product(product_name='Old', sku='S-1')
+    newest = add_product(product_name='New', sku='S-2')
+    listing = client.get('/products')
+    assert listing.last_modified is None
+    client.delete(f'/product/{newest}')
+    response = client.get('/products', headers={'If-Modified-Since': 'Fri, 01 Jan 2100 00:00:00 GMT',
+                                                 'If-None-Match': listing.headers['ETag']})
+    assert response.status_code == 200
+    assert [p['sku'] for p in response.get_json()['products']] == ['S-1']
+
+
+def test_write_from_another_worker_misses_the_cache(app, client, add_product):
+    product_id = add_product(product_name='Sheet', sku='S-1')
+    assert client.get('/products').headers['X-Cache'] == 'MISS'
+    assert client.get('/products').headers['X-Cache'] == 'HIT'
+    # Another worker commits without clearing this worker's cache
+    with app.app_context():
+        run_write(lambda: db.session.get(Product, product_id).__setattr__('product_name', 'Renamed'))
+    response = client.get('/products')
+    assert response.headers['X-Cache'] == 'MISS'
+    assert response.get_json()['products'][0]['product_name'] == 'Renamed'
@@ -0,0 +1,37 @@
+def changes(client, since, **args):
+    return client.get('/products/changes', query_string={'since': since, **args}).get_json()
+
+
+def test_feed_returns_only_changes_after_since(client, add_product):
+    start = changes(client, 0)['current_version']
+    first = add_product(product_name='One', sku='F-1')
+    second = add_product(product_name='Two', sku='F-2')
+    feed = changes(client, start)
+    assert [(c['op'], c['product']['id']) for c in feed['changes']] == [('upsert', first), ('upsert', second)]
+    assert feed['has_more'] is False
+
+    assert client.put(f'/product/{first}', json={'product_name': 'Uno'}).status_code == 200
+    feed = changes(client, feed['next_since'])
+    assert [(c['product']['id'], c['product']['product_name']) for c in feed['changes']] == [(first, 'Uno')]
+    assert changes(client, feed['next_since'])['changes'] == []
+
+
+def test_deletes_appear_as_tombstones(client, add_product):
+    product_id = add_product(product_name='Gone', sku='F-1')
+    since = changes(client, 0)['current_version']
+    assert client.delete(f'/product/{product_id}').status_code == 200
+    feed = changes(client, since)
+    assert feed['changes'] == [{'version': feed['next_since'], 'op': 'delete', 'id': product_id, 'sku': 'F-1'}]
+
+
+def test_feed_pages_with_next_since(client, add_product):
+    start = changes(client, 0)['current_version']
+    ids = [add_product(product_name=f'P{n}', sku=f'F-{n}') for n in range(5)]
+    seen, since = [], start
+    while True:
+        feed = changes(client, since, limit=2)
+        seen += [c['product']['id'] for c in feed['changes']]
+        since = feed['next_since']
+        if not feed['has_more']:
+            break
+    assert seen == ids
@@ -0,0 +1,33 @@
+import gzip
+
+
+def test_compressed_json_gets_a_weak_etag(client, add_product):
+    for n in range(5):
+        add_product(product_name=f'Neoprene Sheet {n}', sku=f'C-{n}', short_description='oil resistant ' * 10)
+    response = client.get('/products', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['ETag'].startswith('W/')
+    assert gzip.decompress(response.data).startswith(b'{')
+    etag = response.headers['ETag']
+    assert client.get('/products', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag}).status_code == 304
+
+
+def test_uncompressed_response_keeps_its_strong_etag(client, add_product):
+    product_id = add_product(product_name='Mat', sku='C-1')
+    # Too small to compress
+    response = client.get(f'/product/{product_id}?fields=id', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert not response.headers['ETag'].startswith('W/')
+
+
+def test_static_files_use_precompressed_variants(app, client, tmp_path, monkeypatch):
+    (tmp_path / 'site.css').write_text('body { color: black; }\n' * 50)
+    (tmp_path / 'site.css.gz').write_bytes(gzip.compress((tmp_path / 'site.css').read_bytes()))
+    monkeypatch.setattr(app, 'static_folder', str(tmp_path))
+    response = client.get('/static/site.css', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.mimetype == 'text/css'
+    response.close()
+    response = client.get('/static/site.css')
+    assert 'Content-Encoding' not in response.headers
+    response.close()
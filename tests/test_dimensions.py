@@ -0,0 +1,38 @@
+def rubber(add_product, sku, **dimensions):
+    return add_product(product_name=sku, sku=sku, is_rubber=True,
+                       **{f'rubber_{name}': value for name, value in dimensions.items()})
+
+
+def search(client, query):
+    return client.get('/search?' + query).get_json()
+
+
+def test_range_filters_are_inclusive_and_combine(client, add_product):
+    rubber(add_product, 'D-1', thickness=2, length=1000)
+    rubber(add_product, 'D-2', thickness=5, length=2000)
+    rubber(add_product, 'D-3', thickness=8, length=1000)
+    add_product(product_name='No dimensions', sku='D-4')
+    assert [p['sku'] for p in search(client, 'min_thickness=2&max_thickness=5')['products']] == ['D-1', 'D-2']
+    assert [p['sku'] for p in search(client, 'min_thickness=3&max_length=1500')['products']] == ['D-3']
+    assert [p['sku'] for p in search(client, 'max_thickness=1')['products']] == []
+
+
+def test_nearest_orders_by_relative_distance(client, add_product):
+    rubber(add_product, 'D-1', thickness=4, length=1000)
+    rubber(add_product, 'D-2', thickness=6, length=1100)
+    rubber(add_product, 'D-3', thickness=5.5, length=3000)
+    add_product(product_name='No dimensions', sku='D-4')
+    # 1mm off on a 5mm thickness counts for more than 100mm off on a 1000mm length
+    result = search(client, 'near_thickness=5&near_length=1000')
+    assert [p['sku'] for p in result['products']] == ['D-1', 'D-2', 'D-3']
+    assert result['total_items'] == 3
+
+
+def test_nearest_keeps_the_product_on_the_edge_of_its_box(client, add_product):
+    for n, thickness in enumerate([0.21, 76.5, 80]):
+        rubber(add_product, f'D-{n}', thickness=thickness)
+    result = search(client, 'near_thickness=38.14&per_page=1')
+    assert result['total_items'] == 3
+    assert [p['sku'] for p in result['products']] == ['D-0']
+    result = search(client, 'near_thickness=38.14&per_page=1&page=2')
+    assert [p['sku'] for p in result['products']] == ['D-1']
@@ -0,0 +1,48 @@
+import csv
+import gzip
+import io
+import json
+
+
+def export(client, query='', **headers):
+    response = client.get('/products/export' + query, headers=headers)
+    assert response.status_code == 200
+    return response
+
+
+def test_ndjson_export_streams_one_product_per_line(client, add_product):
+    ids = [add_product(product_name=f'P{n}', sku=f'X-{n}') for n in range(3)]
+    response = export(client)
+    assert response.mimetype == 'application/x-ndjson'
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row['id'] for row in rows] == ids
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_csv_export_joins_list_fields(client, add_product):
+    add_product(product_name='Sheet', sku='X-1', product_image_urls=['a.jpg', 'b.jpg'],
+                variants=[{'name': '2mm', 'price': 5.0, 'sku': 'X-1-2'}])
+    response = export(client, '?format=csv&fields=sku,product_image_urls,variants')
+    assert response.mimetype == 'text/csv'
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert rows == [{'sku': 'X-1', 'product_image_urls': 'a.jpg,b.jpg',
+                     'variants': json.dumps([{'name': '2mm', 'price': 5.0, 'sku': 'X-1-2'}])}]
+
+
+def test_export_fields_projection(client, add_product):
+    add_product(product_name='Sheet', sku='X-1')
+    rows = [json.loads(line) for line in export(client, '?fields=sku,product_name').get_data(as_text=True).splitlines()]
+    assert rows == [{'sku': 'X-1', 'product_name': 'Sheet'}]
+    assert client.get('/products/export?fields=nope').status_code == 400
+    assert client.get('/products/export?format=xml').status_code == 400
+
+
+def test_export_gzip_follows_accept_encoding_q_values(client, add_product):
+    add_product(product_name='Sheet', sku='X-1')
+    response = export(client, '?fields=sku', **{'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(response.data)) == {'sku': 'X-1'}
+    refused = export(client, '?fields=sku', **{'Accept-Encoding': 'gzip;q=0, identity'})
+    assert 'Content-Encoding' not in refused.headers
+    assert json.loads(refused.data) == {'sku': 'X-1'}
+    assert export(client, '?fields=sku&gzip=true').headers['Content-Encoding'] == 'gzip'
@@ -0,0 +1,25 @@
+def buckets(client, query=''):
+    return {b['min']: b['count'] for b in client.get('/facets' + query).get_json()['price_buckets']}
+
+
+def test_price_buckets_floor_negative_prices(client, add_product):
+    add_product(product_name='Credit', sku='F-1', offer_price=-20, category='Rubber')
+    add_product(product_name='Cheap', sku='F-2', offer_price=20, category='Rubber')
+    add_product(product_name='Dear', sku='F-3', offer_price=620, category='Rubber')
+    assert buckets(client) == {-500: 1, 0: 1, 500: 1}
+    # A filtered request groups in SQL instead of reading the summary table; both must agree
+    assert buckets(client, '?category=Rubber') == {-500: 1, 0: 1, 500: 1}
+
+
+def test_summary_follows_writes(client, add_product):
+    product_id = add_product(product_name='Sheet', sku='F-1', offer_price=100, category='Rubber')
+    client.put(f'/product/{product_id}', json={'offer_price': 700, 'category': 'Foam'})
+    facets = client.get('/facets').get_json()
+    assert facets['categories'] == [{'value': 'Foam', 'count': 1}]
+    assert buckets(client) == {500: 1}
+
+
+def test_listing_links_price_buckets(ui_client, add_product):
+    add_product(product_name='Sheet', sku='F-1', offer_price=20)
+    html = ui_client.get('/').get_data(as_text=True)
+    assert 'min_price=0&amp;max_price=500' in html
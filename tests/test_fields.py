@@ -0,0 +1,45 @@
+import pytest
+from sqlalchemy import event
+
+from app import PRODUCT_FIELDS, db
+
+
+@pytest.fixture
+def statements(app):
+    seen = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        seen.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    yield seen
+    event.remove(engine, 'before_cursor_execute', record)
+
+
+def test_fields_select_exactly_the_requested_keys(client, add_product):
+    product_id = add_product(product_name='Sheet', sku='F-1', variants=[{'name': '2mm', 'price': 5.0, 'sku': 'F-1-2'}])
+    assert client.get(f'/product/{product_id}?fields=sku,variants').get_json() == {
+        'sku': 'F-1', 'variants': [{'name': '2mm', 'price': 5.0, 'sku': 'F-1-2'}]}
+    assert client.get('/products?fields=id,sku').get_json()['products'] == [{'id': product_id, 'sku': 'F-1'}]
+    assert client.get('/search?q=sheet&fields=product_name').get_json()['products'] == [{'product_name': 'Sheet'}]
+    assert list(client.get(f'/product/{product_id}').get_json()) == PRODUCT_FIELDS
+
+
+def test_unknown_fields_are_rejected(client):
+    response = client.get('/products?fields=sku,nope')
+    assert response.status_code == 400
+    assert 'nope' in response.get_json()['error']
+
+
+def test_fields_skip_unrequested_child_tables(client, add_product, statements):
+    add_product(product_name='Sheet', sku='F-1', product_image_urls=['a.jpg'],
+                variants=[{'name': '2mm', 'price': 5.0, 'sku': 'F-1-2'}])
+    statements.clear()
+    client.get('/products?fields=sku,product_name')
+    assert not any('product_variant' in s or 'product_image' in s for s in statements)
+    statements.clear()
+    client.get('/products?fields=sku,variants')
+    assert any('FROM product_variant' in s for s in statements)
+    assert not any('product_image' in s for s in statements)
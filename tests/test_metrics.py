@@ -0,0 +1,81 @@
+import re
+import threading
+
+from sqlalchemy import event
+
+from app import db
+
+SAMPLE = re.compile(r'^(\w+)(?:\{(.*)\})? (\S+)$')
+
+
+def scrape(client):
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    samples = {}
+    for line in response.get_data(as_text=True).splitlines():
+        if line.startswith('#'):
+            continue
+        name, labels, value = SAMPLE.match(line).groups()
+        samples[(name, labels or '')] = float(value)
+    return response.get_data(as_text=True), samples
+
+
+def test_every_family_has_help_and_type(client):
+    text, _ = scrape(client)
+    lines = text.splitlines()
+    for name, kind in [('http_requests_total', 'counter'), ('http_request_sql_queries', 'histogram'),
+                       ('response_cache_entries', 'gauge')]:
+        help_line = lines.index(next(line for line in lines if line.startswith(f'# HELP {name} ')))
+        assert lines[help_line + 1] == f'# TYPE {name} {kind}'
+
+
+def test_histogram_buckets_are_cumulative(client, add_product):
+    product_id = add_product(product_name='Sheet', sku='M-1')
+    client.get(f'/product/{product_id}')
+    _, samples = scrape(client)
+    labels = 'method="GET",route="/product/<int:product_id>"'
+    buckets = [(key[1], value) for key, value in samples.items()
+               if key[0] == 'http_request_sql_queries_bucket' and key[1].startswith(labels + ',le=')]
+    assert buckets[-1][0] == labels + ',le="+Inf"'
+    counts = [value for _, value in buckets]
+    assert counts == sorted(counts)
+    assert counts[-1] == samples[('http_request_sql_queries_count', labels)] >= 1
+
+
+def test_sql_queries_are_charged_to_the_request(app, client, add_product):
+    product_id = add_product(product_name='Sheet', sku='M-1', variants=[{'name': '2mm', 'price': 5.0}])
+    labels = 'method="GET",route="/product/<int:product_id>"'
+    _, before = scrape(client)
+    seen = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        # Background threads (the write queue, the suggest index) are not the request's
+        if threading.get_ident() == request_thread:
+            seen.append(statement)
+
+    request_thread = threading.get_ident()
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'after_cursor_execute', record)
+    try:
+        assert client.get(f'/product/{product_id}?fields=sku,variants').status_code == 200
+    finally:
+        event.remove(engine, 'after_cursor_execute', record)
+    _, after = scrape(client)
+
+    def delta(name):
+        return after[(name, labels)] - before.get((name, labels), 0)
+
+    assert seen
+    assert delta('http_request_sql_queries_count') == 1
+    assert delta('http_request_sql_queries_sum') == len(seen)
+
+
+def test_requests_are_counted_by_status(client):
+    key = ('http_requests_total', 'method="GET",route="/product/<int:product_id>",status="404"')
+    _, before = scrape(client)
+    client.get('/product/999999')
+    client.get('/product/999998')
+    _, after = scrape(client)
+    assert after[key] - before.get(key, 0) == 2
@@ -0,0 +1,52 @@
+from unittest import mock
+
+from app import Product
+
+
+def walk(client, url):
+    skus, cursor = [], None
+    while True:
+        body = client.get(url + (f'&after={cursor}' if cursor else '')).get_json()
+        skus += [p['sku'] for p in body['products']]
+        cursor = body['next_cursor']
+        if cursor is None:
+            return skus
+
+
+def test_cursor_walks_every_product_once(client, add_product):
+    for i in range(7):
+        add_product(product_name=f'Sheet {i}', sku=f'S-{i}')
+    assert walk(client, '/products?limit=3') == [f'S-{i}' for i in range(7)]
+
+
+def test_cursor_count_is_optional(client, add_product):
+    add_product(product_name='Sheet', sku='S-1')
+    assert 'total_items' not in client.get('/products?limit=5').get_json()
+    assert client.get('/products?limit=5&count=true').get_json()['total_items'] == 1
+
+
+def test_cursor_limit_is_capped(client, add_product, app):
+    add_product(product_name='Sheet', sku='S-1')
+    assert client.get('/products?limit=100000').get_json()['limit'] == app.config['MAX_PER_PAGE']
+
+
+def test_invalid_cursor_is_a_bad_request(client):
+    response = client.get('/products?after=not-a-cursor')
+    assert response.status_code == 400
+    assert 'Invalid cursor' in response.get_json()['error']
+
+
+def test_ranked_search_rejects_cursor_mode(client, add_product):
+    add_product(product_name='Neoprene Sheet', sku='S-1')
+    assert client.get('/search?q=neoprene&limit=5').status_code == 400
+    assert client.get('/search?limit=5').status_code == 200
+
+
+def test_serialization_errors_are_not_reported_as_bad_cursors(client, add_product):
+    add_product(product_name='Sheet', sku='S-1')
+    with mock.patch.object(Product, 'to_dict', side_effect=ValueError('boom')):
+        client.application.config['PROPAGATE_EXCEPTIONS'] = False
+        try:
+            assert client.get('/products?limit=5').status_code == 500
+        finally:
+            client.application.config['PROPAGATE_EXCEPTIONS'] = None
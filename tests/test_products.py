@@ -0,0 +1,72 @@
+import json
+
+import pytest
+from sqlalchemy import text
+
+from app import Product, ProductVariant, db, migrate_legacy_media
+
+LEGACY_COLUMNS = ['variants', 'download_pdfs', 'product_image_urls', 'youtube_links', 'product_image_renditions']
+
+
+def test_sku_lookup_matches_product_then_variant(client, add_product):
+    product_id = add_product(product_name='Sheet', sku='P-1', variants=[
+        {'name': '2mm', 'price': 5.0, 'sku': 'P-1-2'}, {'name': '3mm', 'price': 6.0, 'sku': 'P-1-3'}])
+    product = client.get('/product/sku/P-1').get_json()
+    assert (product['id'], product['matched_variant']) == (product_id, None)
+    product = client.get('/product/sku/P-1-3').get_json()
+    assert product['id'] == product_id
+    assert product['matched_variant'] == {'name': '3mm', 'price': 6.0, 'sku': 'P-1-3'}
+    assert [v['name'] for v in product['variants']] == ['2mm', '3mm']
+    assert client.get('/product/sku/P-9').status_code == 404
+
+
+@pytest.mark.parametrize('variants', [['x'], 'not json', {'name': 'x'}])
+def test_malformed_variants_are_rejected(client, add_product, variants):
+    product_id = add_product(product_name='Sheet', sku='P-1')
+    assert client.post('/add-product', json={'sku': 'P-2', 'variants': variants}).status_code == 400
+    assert client.put(f'/product/{product_id}', json={'variants': variants}).status_code == 400
+    response = client.patch('/products/batch', json={'products': [{'id': product_id, 'variants': variants}]})
+    assert response.status_code == 400
+    body = json.dumps({'sku': 'P-1', 'variants': variants}) + '\n'
+    result = client.post('/products/bulk', data=body, content_type='application/x-ndjson').get_json()
+    assert (result['updated'], result['failed']) == (0, 1)
+
+
+@pytest.fixture
+def legacy_columns(app):
+    with app.app_context():
+        for name in LEGACY_COLUMNS:
+            db.session.execute(text(f'ALTER TABLE product ADD COLUMN {name} TEXT'))
+        db.session.commit()
+    yield app
+    with app.app_context():
+        for name in LEGACY_COLUMNS:
+            db.session.execute(text(f'ALTER TABLE product DROP COLUMN {name}'))
+        db.session.commit()
+
+
+def test_migrate_legacy_media_moves_columns_into_child_tables(legacy_columns, app):
+    with app.app_context():
+        for sku in ('L-1', 'L-2'):
+            db.session.add(Product(product_name=sku, sku=sku))
+        db.session.commit()
+        db.session.execute(text(
+            "UPDATE product SET variants = :variants, product_image_urls = :images, download_pdfs = 'a.pdf', "
+            "youtube_links = 'https://youtu.be/1,https://youtu.be/2', product_image_renditions = :renditions"
+        ), {'variants': json.dumps([{'name': 'Big', 'price': 9.5, 'sku': 'V-1'}]), 'images': 'one.jpg,two.jpg',
+            'renditions': json.dumps({'two.jpg': {'thumb': {'width': 150}}})})
+        db.session.commit()
+
+        migrate_legacy_media(batch_size=1)
+
+        product = Product.query.filter_by(sku='L-2').one()
+        assert product.variant_data == [{'name': 'Big', 'price': 9.5, 'sku': 'V-1'}]
+        assert product.image_urls == ['one.jpg', 'two.jpg']
+        assert product.images_with_renditions() == [('one.jpg', None), ('two.jpg', {'thumb': {'width': 150}})]
+        assert product.pdf_urls == ['a.pdf']
+        assert product.video_links == ['https://youtu.be/1', 'https://youtu.be/2']
+        assert ProductVariant.query.count() == 2
+        # Migrated rows are cleared, so running it again adds nothing
+        assert db.session.execute(text('SELECT count(*) FROM product WHERE variants IS NOT NULL')).scalar() == 0
+        migrate_legacy_media()
+        assert ProductVariant.query.count() == 2
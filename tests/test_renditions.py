@@ -0,0 +1,37 @@
+import io
+import os
+
+import pytest
+
+from app import Image, RenditionPools
+
+
+@pytest.mark.skipif(Image is None, reason='Pillow is not installed')
+def test_upload_renditions_are_stored_in_the_background(ui_client, client, wait_for):
+    image = io.BytesIO()
+    Image.new('RGB', (1200, 900), 'red').save(image, 'JPEG')
+    image.seek(0)
+    response = ui_client.post('/add', data={'product_name': 'Sheet', 'sku': 'R-1', 'images': (image, 'sheet.jpg')},
+                              content_type='multipart/form-data')
+    assert response.status_code == 302
+
+    def renditions():
+        product = client.get('/product/sku/R-1').get_json()
+        return product['product_image_renditions'] and product['product_image_renditions'][0]
+
+    wait_for(renditions)
+    assert set(renditions()) == {'thumb', 'medium'}
+    assert renditions()['thumb']['width'] == 320
+
+
+def test_each_worker_process_gets_its_own_pools(monkeypatch):
+    pools = RenditionPools(1)
+    first = pools.get()
+    assert pools.get() == first
+    # A worker forked after the pools were created must not share their queues
+    monkeypatch.setattr(os, 'getpid', lambda: -1)
+    second = pools.get()
+    assert second[0] is not first[0] and second[1] is not first[1]
+    monkeypatch.undo()
+    for pool in first + second:
+        pool.shutdown()
@@ -0,0 +1,21 @@
+def test_search_matches_word_prefixes(client, add_product):
+    add_product(product_name='Neoprene Sheet', sku='S-1')
+    add_product(product_name='Viton Gasket', sku='S-2')
+    products = client.get('/search?q=neop').get_json()['products']
+    assert [p['sku'] for p in products] == ['S-1']
+
+
+def test_punctuation_only_query_does_not_match_everything(client, add_product):
+    add_product(product_name='O-Ring', sku='S-1')
+    add_product(product_name='Gasket', sku='S-2')
+    products = client.get('/search?q=-').get_json()['products']
+    assert [p['sku'] for p in products] == ['S-1']
+    assert client.get('/search?q=%2B%2B').get_json()['products'] == []
+
+
+def test_listing_search_keeps_relevance_order(ui_client, add_product):
+    add_product(product_name='Rubber Mat', sku='S-1', long_description='works under a gasket')
+    add_product(product_name='Gasket Roll', sku='S-2')
+    page = ui_client.get('/?q=gasket').get_data(as_text=True)
+    # The name match outranks the description match even though it has the higher id
+    assert page.index('Gasket Roll') < page.index('Rubber Mat')
@@ -0,0 +1,67 @@
+import json
+
+
+def reserve(client, product_id, quantity):
+    return client.post(f'/product/{product_id}/stock', json={'op': 'reserve', 'quantity': quantity})
+
+
+def stock_number(client, product_id):
+    return client.get(f'/product/{product_id}').get_json()['stock_number']
+
+
+def test_put_cannot_drop_stock_below_reserved(client, add_product):
+    product_id = add_product(sku='S-1', product_name='Sheet', stock_number=10)
+    assert reserve(client, product_id, 6).status_code == 200
+    response = client.put(f'/product/{product_id}', json={'stock_number': 5, 'product_name': 'Renamed'})
+    assert response.status_code == 409
+    assert response.get_json()['failures'] == [{'id': product_id, 'stock_number': 5}]
+    product = client.get(f'/product/{product_id}').get_json()
+    assert (product['stock_number'], product['product_name']) == (10, 'Sheet')
+    assert client.put(f'/product/{product_id}', json={'stock_number': 6}).status_code == 200
+
+
+def test_batch_update_below_reserved_changes_nothing(client, add_product):
+    first = add_product(sku='S-1', product_name='One', stock_number=10)
+    second = add_product(sku='S-2', product_name='Two', stock_number=10)
+    assert reserve(client, second, 4).status_code == 200
+    response = client.patch('/products/batch', json={'products': [
+        {'id': first, 'stock_number': 1}, {'id': second, 'stock_number': 3}]})
+    assert response.status_code == 409
+    assert [failure['id'] for failure in response.get_json()['failures']] == [second]
+    assert (stock_number(client, first), stock_number(client, second)) == (10, 10)
+
+
+def test_bulk_update_below_reserved_fails_only_its_row(client, add_product):
+    product_id = add_product(sku='S-1', product_name='One', stock_number=10)
+    assert reserve(client, product_id, 4).status_code == 200
+    body = ''.join(json.dumps(line) + '\n' for line in [{'sku': 'S-1', 'stock_number': 2}, {'sku': 'S-2'}])
+    result = client.post('/products/bulk', data=body, content_type='application/x-ndjson').get_json()
+    assert (result['inserted'], result['updated'], result['failed']) == (1, 0, 1)
+    assert result['errors'][0]['sku'] == 'S-1'
+    assert stock_number(client, product_id) == 10
+
+
+def test_edit_form_below_reserved_is_rejected(ui_client, add_product):
+    product_id = add_product(sku='S-1', product_name='Sheet', stock_number=10)
+    assert reserve(ui_client, product_id, 6).status_code == 200
+    response = ui_client.post(f'/edit/{product_id}', data={'product_name': 'Sheet', 'sku': 'S-1', 'stock_number': '2'})
+    assert response.status_code == 409
+    assert b'stock_number is below stock_reserved' in response.data
+    assert stock_number(ui_client, product_id) == 10
+
+
+def test_multi_line_order_is_all_or_nothing(client, add_product):
+    first = add_product(sku='S-1', product_name='One', stock_number=5)
+    second = add_product(sku='S-2', product_name='Two', stock_number=1)
+    response = client.post('/products/stock', json={'op': 'decrement', 'lines': [
+        {'sku': 'S-1', 'quantity': 2}, {'id': second, 'quantity': 3}]})
+    assert response.status_code == 409
+    assert response.get_json()['failures'] == [{'id': second, 'quantity': 3}]
+    # The line that fit was rolled back with the one that didn't
+    assert (stock_number(client, first), stock_number(client, second)) == (5, 1)
+
+    response = client.post('/products/stock', json={'op': 'decrement', 'lines': [
+        {'sku': 'S-1', 'quantity': 2}, {'id': second, 'quantity': 1}]})
+    assert response.status_code == 200
+    assert [line['available'] for line in response.get_json()['lines']] == [3, 0]
+    assert client.get(f'/product/{second}').get_json()['in_stock'] is False
@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+
+from app import SuggestIndex, suggest_index
+
+
+def test_suggest_follows_writes(client, add_product, wait_for):
+    add_product(sku='SG-1', product_name='Neoprene Gasket')
+
+    def suggested():
+        return [s['text'] for s in client.get('/suggest?q=neop').get_json()['suggestions']]
+    wait_for(lambda: 'Neoprene Gasket' in suggested())
+    assert suggest_index.ready.is_set()
+
+
+def test_product_count_is_bounded(app):
+    index = SuggestIndex(max_phrases=100, max_products=2, max_length=100)
+    for product_id in (1, 2, 3):
+        index.put(product_id, (f'Product {product_id}', f'SKU-{product_id}', None, None))
+    assert sorted(index.products) == [1, 2]
+    # Freeing a slot lets the next product in
+    index.delete(1)
+    index.put(3, ('Product 3', 'SKU-3', None, None))
+    assert sorted(index.products) == [2, 3]
+
+
+def test_importing_the_app_does_not_build_the_index():
+    # Only a process that serves requests builds the index; CLI commands and scripts never do
+    code = 'import app, sys; sys.exit(app.suggest_index.thread is not None)'
+    env = {**os.environ, 'PYTHONPATH': os.path.dirname(os.path.dirname(os.path.abspath(__file__)))}
+    assert subprocess.run([sys.executable, '-c', code], env=env).returncode == 0
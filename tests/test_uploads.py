@@ -0,0 +1,39 @@
+import hashlib
+import io
+import os
+
+from app import metrics, upload_store
+from werkzeug.datastructures import FileStorage
+
+
+def upload_count(outcome):
+    return metrics.values['uploads_total'].get((('outcome', outcome),), 0)
+
+
+def test_store_names_files_by_content_and_deduplicates():
+    content = b'%PDF-1.4 datasheet'
+    stored, deduplicated = upload_count('stored'), upload_count('deduplicated')
+    first = upload_store.save(FileStorage(io.BytesIO(content), filename='Sheet.PDF'))
+    second = upload_store.save(FileStorage(io.BytesIO(content), filename='copy.pdf'))
+    assert first == second == f'{hashlib.sha256(content).hexdigest()}.pdf'
+    assert upload_count('deduplicated') == deduplicated + 1
+    assert upload_count('stored') == stored + 1
+    assert upload_store.save(FileStorage(io.BytesIO(b'\xff\xd8 photo'), filename='photo.jpeg')).endswith('.jpg')
+
+
+def test_content_addressed_uploads_are_immutable(app, client, monkeypatch):
+    # Uploads are saved under the working directory, which the app root is in production
+    monkeypatch.setattr(app, 'root_path', os.getcwd())
+    content = b'%PDF-1.4 ' + b'x' * 100
+    name = upload_store.save(FileStorage(io.BytesIO(content), filename='sheet.pdf'))
+    response = client.get(f'/static/uploads/{name}')
+    assert response.data == content
+    assert 'immutable' in response.headers['Cache-Control']
+    assert response.headers['ETag'] == f'"{name.split(".")[0]}"'
+    response.close()
+    response = client.get(f'/static/uploads/{name}', headers={'If-None-Match': f'"{name.split(".")[0]}"'})
+    assert response.status_code == 304
+    response.close()
+    response = client.get(f'/static/uploads/{name}', headers={'Range': 'bytes=0-7'})
+    assert (response.status_code, response.data) == (206, b'%PDF-1.4')
+    response.close()
@@ -0,0 +1,117 @@
+import sqlite3
+import threading
+from contextlib import closing
+
+import pytest
+
+from app import Product, db, run_write, write_queue, WriteTimeout
+
+
+@pytest.fixture
+def write_queue_enabled(app):
+    app.config['WRITE_QUEUE_ENABLED'] = True
+    yield app
+    app.config['WRITE_QUEUE_ENABLED'] = False
+
+
+def product_count(app):
+    with app.app_context():
+        return Product.query.count()
+
+
+def test_failed_write_is_rolled_back(app):
+    def write():
+        db.session.add(Product(product_name='Half written', sku='W-1'))
+        db.session.flush()
+        raise RuntimeError('boom')
+
+    with app.app_context():
+        with pytest.raises(RuntimeError):
+            run_write(write)
+        # The session is usable again and nothing was committed
+        assert Product.query.count() == 0
+
+
+def test_failed_queued_write_is_rolled_back(write_queue_enabled, app):
+    def write():
+        db.session.add(Product(product_name='Half written', sku='W-1'))
+        db.session.flush()
+        raise RuntimeError('boom')
+
+    with app.app_context():
+        with pytest.raises(RuntimeError):
+            run_write(write)
+    assert product_count(app) == 0
+
+
+def test_ui_and_api_writes_go_through_the_queue(write_queue_enabled, ui_client, client, add_product):
+    product_id = add_product(product_name='Sheet', sku='W-1')
+    assert ui_client.post(f'/edit/{product_id}', data={'product_name': 'Edited', 'stock_number': '3'}).status_code == 302
+    assert ui_client.post('/add', data={'product_name': 'Added', 'sku': 'W-2'}).status_code == 302
+    assert client.get(f'/product/{product_id}').get_json()['product_name'] == 'Edited'
+    assert client.get('/product/sku/W-2').status_code == 200
+
+
+def test_stuck_writer_times_out_and_drops_the_waiting_write(write_queue_enabled, app, client):
+    app.config['WRITE_TIMEOUT'] = 0.2
+    release = threading.Event()
+    blocker = write_queue.submit(lambda: release.wait(5))
+    try:
+        response = client.post('/add-product', json={'product_name': 'Late', 'sku': 'W-1'})
+        assert response.status_code == 503
+        assert response.headers['Retry-After']
+    finally:
+        app.config['WRITE_TIMEOUT'] = 30
+        release.set()
+        blocker.result(5)
+    # The cancelled job never runs once the writer is free again
+    with app.app_context():
+        run_write(lambda: None)
+    assert product_count(app) == 0
+
+
+def test_timeout_is_a_write_timeout(write_queue_enabled, app):
+    app.config['WRITE_TIMEOUT'] = 0.1
+    release = threading.Event()
+    blocker = write_queue.submit(lambda: release.wait(5))
+    try:
+        with app.app_context(), pytest.raises(WriteTimeout):
+            run_write(lambda: None)
+    finally:
+        app.config['WRITE_TIMEOUT'] = 30
+        release.set()
+        blocker.result(5)
+
+
+def test_queued_batch_commits_once(write_queue_enabled, app):
+    with app.app_context():
+        path = db.engine.url.database
+    seen = []
+
+    def insert(sku):
+        def write():
+            db.session.add(Product(product_name=sku, sku=sku))
+            db.session.flush()
+            # A second connection sees nothing until the whole batch commits
+            with closing(sqlite3.connect(path)) as other:
+                seen.append(other.execute('SELECT count(*) FROM product').fetchone()[0])
+        return write
+
+    def fail():
+        db.session.add(Product(product_name='Failed', sku='Q-X'))
+        db.session.flush()
+        raise RuntimeError('boom')
+
+    release = threading.Event()
+    blocker = write_queue.submit(lambda: release.wait(5))
+    futures = [write_queue.submit(insert('Q-1')), write_queue.submit(fail), write_queue.submit(insert('Q-2'))]
+    release.set()
+    blocker.result(5)
+    futures[0].result(5)
+    futures[2].result(5)
+    with pytest.raises(RuntimeError):
+        futures[1].result(5)
+    assert seen == [0, 0]
+    # The failed job's savepoint was rolled back; the jobs around it were committed
+    with app.app_context():
+        assert sorted(sku for (sku,) in db.session.query(Product.sku)) == ['Q-1', 'Q-2']